@@ -0,0 +1,296 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import time
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from data_preprocessing import clean_text, extract_features, get_category_stats, load_data
+from main import REPORT_COLUMNS, compute_category_metrics, compute_report_metrics, render_report
+from pricing_model import BACKENDS, PricingModel
+from profiling import peak_rss_mb
+from sentiment_analysis import score_reviews
+from storage import atomic_write, atomic_write_csv
+
+# 默认的合成数据规模（行数）
+BENCHMARK_SIZES = [10_000, 100_000, 1_000_000]
+# 合成数据缓存目录，同一规模和随机种子只生成一次
+BENCHMARK_DATA_DIR = 'data/benchmark'
+# 基准结果；再次运行时默认与该文件中的上一次结果比较
+BENCHMARK_RESULTS_PATH = 'data/benchmark_results.json'
+
+# 合成数据的类别层级（主类别 -> 子类别路径）和主类别的抽样权重，大致与真实数据一致
+CATEGORY_TREE = {
+    'Electronics': [
+        'WearableTechnology|SmartWatches',
+        'Mobiles&Accessories|Smartphones&BasicMobiles|Smartphones',
+        'HomeTheater,TV&Video|Televisions|SmartTelevisions',
+        'Headphones,Earbuds&Accessories|Headphones|In-Ear'
+    ],
+    'Computers&Accessories': [
+        'Accessories&Peripherals|Cables&Accessories|Cables|USBCables',
+        'NetworkingDevices|NetworkAdapters|WirelessUSBAdapters',
+        'Accessories&Peripherals|Keyboards,Mice&InputDevices|Mice',
+        'ExternalDevices&DataStorage|PenDrives'
+    ],
+    'Home&Kitchen': [
+        'Kitchen&HomeAppliances|SmallKitchenAppliances|MixerGrinders',
+        'Heating,Cooling&AirQuality|WaterHeaters&Geysers|InstantWaterHeaters',
+        'Kitchen&Dining|KitchenTools|ManualChoppers&Chippers'
+    ],
+    'OfficeProducts': ['OfficePaperProducts|Paper|Stationery|Pens,Pencils&WritingSupplies|Pens&Refills'],
+    'MusicalInstruments': ['Microphones|Condenser'],
+    'HomeImprovement': ['Cleaning&Supplies|Dusters,Brooms&Mops'],
+    'Toys&Games': ['Arts&Crafts|Drawing&PaintingSupplies|ColouringPens&Markers'],
+    'Car&Motorbike': ['CarAccessories|InteriorAccessories|AirPurifiers&Ionizers'],
+    'Health&PersonalCare': ['HomeMedicalSupplies&Equipment|HealthMonitors|DigitalBathroomScales']
+}
+CATEGORY_WEIGHTS = [0.34, 0.31, 0.3, 0.01, 0.005, 0.01, 0.005, 0.005, 0.01]
+
+_BRANDS = ['boAt', 'Samsung', 'Redmi', 'Philips', 'Prestige', 'Havells', 'Logitech', 'HP',
+           'SanDisk', 'Ambrane', 'Portronics', 'Noise', 'Fire-Boltt', 'Bajaj', 'Pigeon', 'Classmate']
+_PRODUCTS = ['USB Type-C Cable', 'Smart Watch', 'Wireless Earbuds', 'Mixer Grinder', 'Wireless Mouse',
+             'Pen Drive 64GB', 'LED Smart TV', 'Instant Water Heater', 'Gel Pen Set', 'Condenser Microphone']
+_VARIANTS = ['(Black)', '(White, 1.5m)', 'with Fast Charging', '- 2 Year Warranty', '(Pack of 2)', 'Pro', 'Lite', '']
+
+_POSITIVE_PHRASES = ['Good product', 'Worth the money', 'Excellent quality', 'Works perfectly',
+                     'Very nice', 'Value for money', 'Fast charging', 'Loved it', 'Superb build']
+_NEGATIVE_PHRASES = ['Stopped working', 'Poor quality', 'Not worth it', 'Very bad',
+                     'Waste of money', 'Broke in a week', 'Disappointed', 'Slow charging', 'Defective piece']
+_DETAILS = ['after 2 months of use', 'for the price', 'delivery was quick', 'as described',
+            'compared to the original', 'battery backup is 10 hrs', 'packaging was damaged', 'in this range']
+_ENDINGS = ['.', '!', '!!', ' 👍', ' 😡', '...', ' :)', '']
+_FEATURES = ['Compatible with all Type-C devices', 'Up to 480Mbps data transfer', '1 year manufacturer warranty',
+             'Made of durable braided nylon', 'Includes 3 jars and 3 blades', 'BIS certified, 5 star rated',
+             'Bluetooth 5.3 with 40H playtime', 'IP67 water and dust resistance', 'Ergonomic design for all-day use']
+
+def _phrases(heads, rng, count=300):
+    """由短语模板组合出 count 条不同的句子"""
+    sentences = {
+        f"{heads[rng.integers(len(heads))]} {_DETAILS[rng.integers(len(_DETAILS))]}"
+        f"{_ENDINGS[rng.integers(len(_ENDINGS))]}"
+        for _ in range(count * 4)
+    }
+    return sorted(sentences)[:count]
+
+def _join_rows(pool, choice, counts, sep):
+    """按行把 pool[choice[i, :counts[i]]] 拼接成字符串"""
+    picked = np.asarray(pool, dtype=object)[choice].tolist()
+    return [sep.join(row[:count]) for row, count in zip(picked, counts)]
+
+def generate_catalog(n, seed=0):
+    """生成 n 行与原始亚马逊数据同结构的合成商品数据
+
+    价格为 "₹1,099" 格式、折扣为 "64%" 格式、类别以 "|" 分隔、评论为逗号拼接的多条评论，
+    评分和评论数含少量无法解析或缺失的值。评论的正负面比例随评分变化。
+    """
+    rng = np.random.default_rng(seed)
+    main_categories = list(CATEGORY_TREE)
+    weights = np.asarray(CATEGORY_WEIGHTS) / np.sum(CATEGORY_WEIGHTS)
+    main_idx = rng.choice(len(main_categories), size=n, p=weights)
+    paths = [f"{main}|{sub}" for main in main_categories for sub in CATEGORY_TREE[main]]
+    offsets = np.cumsum([0] + [len(CATEGORY_TREE[main]) for main in main_categories])
+    sizes = np.diff(offsets)
+    path_idx = offsets[main_idx] + (rng.random(n) * sizes[main_idx]).astype(np.int64)
+
+    actual = np.clip(np.round(rng.lognormal(np.log(1500), 1.1, n)), 39, 150_000).astype(np.int64)
+    discount = np.round(rng.beta(2, 2.5, n) * 90).astype(np.int64)
+    discounted = np.maximum(np.round(actual * (1 - discount / 100)), 1).astype(np.int64)
+    rating = np.round(np.clip(rng.normal(4.1, 0.3, n), 1, 5), 1)
+    rating_count = np.round(rng.lognormal(7, 2, n)).astype(np.int64) + 1
+
+    rating_text = np.char.mod('%.1f', rating).astype(object)
+    rating_text[rng.random(n) < 1e-4] = '|'
+    count_text = np.array([f"{c:,}" for c in rating_count], dtype=object)
+    count_text[rng.random(n) < 1e-3] = np.nan
+
+    # 评论：每条从正面或负面句子中抽取，正面概率随评分升高
+    positive = _phrases(_POSITIVE_PHRASES, rng)
+    negative = _phrases(_NEGATIVE_PHRASES, rng)
+    max_reviews = 5
+    is_positive = rng.random((n, max_reviews)) < ((rating - 1) / 4)[:, None]
+    choice = np.where(
+        is_positive,
+        rng.integers(0, len(positive), (n, max_reviews)),
+        len(positive) + rng.integers(0, len(negative), (n, max_reviews))
+    )
+    review_counts = rng.integers(1, max_reviews + 1, n)
+    titles = [phrase + ending for phrase in _POSITIVE_PHRASES + _NEGATIVE_PHRASES for ending in _ENDINGS]
+    title_choice = np.where(
+        is_positive,
+        rng.integers(0, len(titles) // 2, (n, max_reviews)),
+        len(titles) // 2 + rng.integers(0, len(titles) // 2, (n, max_reviews))
+    )
+
+    return pd.DataFrame({
+        'product_id': [f"B{i:09X}" for i in rng.permutation(n * 4)[:n]],
+        'product_name': [
+            f"{_BRANDS[b]} {_PRODUCTS[p]} {_VARIANTS[v]}".strip()
+            for b, p, v in zip(rng.integers(0, len(_BRANDS), n), rng.integers(0, len(_PRODUCTS), n),
+                               rng.integers(0, len(_VARIANTS), n))
+        ],
+        'category': np.asarray(paths, dtype=object)[path_idx],
+        'discounted_price': [f"₹{p:,}" for p in discounted],
+        'actual_price': [f"₹{p:,}" for p in actual],
+        'discount_percentage': [f"{d}%" for d in discount],
+        'rating': rating_text,
+        'rating_count': count_text,
+        'about_product': _join_rows(_FEATURES, rng.integers(0, len(_FEATURES), (n, 4)),
+                                    rng.integers(2, 5, n), '|'),
+        'review_title': _join_rows(titles, title_choice, review_counts, ','),
+        'review_content': _join_rows(positive + negative, choice, review_counts, ',')
+    })
+
+def catalog_path(n, seed=0, data_dir=BENCHMARK_DATA_DIR):
+    """返回 n 行合成数据的CSV路径，不存在时生成"""
+    path = os.path.join(data_dir, f"catalog_{n}_seed{seed}.csv")
+    if not os.path.exists(path):
+        print(f"Generating {n:,}-row synthetic catalog -> {path}")
+        atomic_write_csv(generate_catalog(n, seed), path)
+    return path
+
+class StubClassifier:
+    """离线基准用的情感分类器
+
+    接口与 transformers 的 pipeline 相同（tokenizer 和按批调用），
+    按正负面词计数给出确定的结果，不需要下载或加载模型。
+    """
+
+    POSITIVE_WORDS = frozenset(w.lower() for phrase in _POSITIVE_PHRASES for w in phrase.split())
+    NEGATIVE_WORDS = frozenset(w.lower() for phrase in _NEGATIVE_PHRASES for w in phrase.split())
+
+    def tokenizer(self, texts, truncation=True, **kwargs):
+        return {'input_ids': [text.split()[:512] if truncation else text.split() for text in texts]}
+
+    def __call__(self, texts, batch_size=32, truncation=True, **kwargs):
+        results = []
+        for text in texts:
+            words = text.lower().split()
+            positive = sum(w in self.POSITIVE_WORDS for w in words)
+            negative = sum(w in self.NEGATIVE_WORDS for w in words)
+            p = (positive + 1) / (positive + negative + 2)
+            if p >= 0.5:
+                results.append({'label': 'POSITIVE', 'score': p})
+            else:
+                results.append({'label': 'NEGATIVE', 'score': 1 - p})
+        return results
+
+def _score_with_stub(df):
+    results = score_reviews(df['cleaned_review'].tolist(), classifier=StubClassifier())
+    df['sentiment'] = [r['label'] for r in results]
+    df['sentiment_score'] = [r['score'] for r in results]
+    return df
+
+def _render_report(df, recommendations):
+    """generate_report 的计算和渲染部分，写入内存而不覆盖项目报告"""
+    metrics = compute_report_metrics(df, recommendations)
+    category_metrics, movers_by_category = compute_category_metrics(df, recommendations)
+    with io.StringIO() as f:
+        render_report(f, metrics, category_metrics=category_metrics, movers_by_category=movers_by_category)
+        return len(f.getvalue())
+
+def run_benchmarks(sizes=BENCHMARK_SIZES, backend='rf', seed=0, verbose=False):
+    """在每个规模的合成数据上依次计时各热点步骤，返回结果记录列表"""
+    results = []
+
+    def timed(size, step, rows, func, *args, **kwargs):
+        # 默认屏蔽被测函数自身的输出（进度、样例等），避免影响计时和阅读
+        quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        with quiet:
+            cpu_start = time.process_time()
+            start = time.perf_counter()
+            value = func(*args, **kwargs)
+            seconds = time.perf_counter() - start
+            cpu_seconds = time.process_time() - cpu_start
+        results.append({
+            'size': size,
+            'step': step,
+            'rows': rows,
+            'seconds': seconds,
+            'cpu_seconds': cpu_seconds,
+            'rows_per_sec': rows / seconds if seconds > 0 else None,
+            'peak_rss_mb': peak_rss_mb()
+        })
+        print(f"{size:>10,} {step:<20} {seconds:9.3f}s {rows / max(seconds, 1e-9):>14,.0f} rows/s")
+        return value
+
+    print(f"{'size':>10} {'step':<20} {'seconds':>10} {'throughput':>20}")
+    for size in sizes:
+        path = catalog_path(size, seed)
+        df = timed(size, 'load_data', size, load_data, path)
+        texts = (df['review_title'] + ' ' + df['review_content']).tolist() + df['about_product'].tolist()
+        timed(size, 'clean_text', len(texts), lambda: [clean_text(text) for text in texts])
+        timed(size, 'extract_features', len(df), extract_features, df)
+        timed(size, 'get_category_stats', len(df), get_category_stats, df)
+        timed(size, 'sentiment_stub', len(df), _score_with_stub, df)
+
+        model = PricingModel(backend)
+        timed(size, f'train_{backend}', len(df), model.train, df)
+        recommendations = timed(size, 'recommend_prices', len(df), model.recommend_prices, df, verbose=False)
+        timed(size, 'generate_report', len(df), _render_report, df[REPORT_COLUMNS], recommendations)
+    return results
+
+def benchmark_environment():
+    """记录影响耗时的运行环境，便于判断两次结果是否可比"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__
+    }
+
+def save_results(results, path=BENCHMARK_RESULTS_PATH, **settings):
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': benchmark_environment(),
+        'settings': settings,
+        'results': results
+    }
+
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    atomic_write(path, write)
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+def compare_results(results, baseline):
+    """按 (规模, 步骤) 比较两次结果的耗时，>1x 表示变慢"""
+    previous = {(r['size'], r['step']): r['seconds'] for r in baseline['results']}
+    print(f"\n=== Compared with {baseline['created_at']} ===")
+    if baseline.get('environment') != benchmark_environment():
+        print("Note: the baseline was recorded in a different environment")
+    for record in results:
+        key = (record['size'], record['step'])
+        if key in previous and previous[key] > 0:
+            ratio = record['seconds'] / previous[key]
+            print(f"{record['size']:>10,} {record['step']:<20} {previous[key]:9.3f}s -> "
+                  f"{record['seconds']:9.3f}s ({ratio:.2f}x)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='在合成数据上对各热点步骤做基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=BENCHMARK_SIZES, help='合成数据的行数')
+    parser.add_argument('--backend', choices=BACKENDS, default='rf', help='定价模型训练后端')
+    parser.add_argument('--seed', type=int, default=0, help='合成数据的随机种子')
+    parser.add_argument('--output', default=BENCHMARK_RESULTS_PATH, help='结果JSON文件路径')
+    parser.add_argument('--baseline', default=None, help='用于比较的结果文件（默认为上一次写入 --output 的结果）')
+    parser.add_argument('--verbose', action='store_true', help='显示被测函数自身的输出')
+    args = parser.parse_args()
+
+    baseline_path = args.baseline or args.output
+    baseline = load_results(baseline_path) if os.path.exists(baseline_path) else None
+    results = run_benchmarks(args.sizes, args.backend, args.seed, args.verbose)
+    save_results(results, args.output, sizes=args.sizes, backend=args.backend, seed=args.seed)
+    print(f"\nResults saved to {args.output}")
+    if baseline is not None:
+        compare_results(results, baseline)
@@ -4,6 +4,8 @@ import plotly.express as px
 import plotly.graph_objects as go
 import os
 
+from storage import PROCESSED_PATH, load_processed
+
 # 设置自定义配色方案
 COLOR_PALETTE = [
     '#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEEAD',
@@ -15,6 +17,12 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 # 获取项目根目录
 root_dir = os.path.dirname(current_dir)
 
+# 看板需要读取的列
+DASHBOARD_COLUMNS = [
+    'product_id', 'product_name', 'main_category', 'discounted_price',
+    'rating', 'rating_count', 'real_discount'
+]
+
 # 页面配置
 st.set_page_config(
     page_title="Amazon Pricing Strategy Dashboard",
@@ -52,7 +60,7 @@ st.markdown("""
 @st.cache_data
 def load_data():
     try:
-        df = pd.read_csv(os.path.join(root_dir, 'data', 'processed_amazon.csv'))
+        df = load_processed(columns=DASHBOARD_COLUMNS, path=os.path.join(root_dir, PROCESSED_PATH))
         recommendations = pd.read_csv(os.path.join(root_dir, 'data', 'price_recommendations.csv'))
         return df, recommendations
     except Exception as e:
@@ -215,7 +223,7 @@ if df is not None and recommendations is not None:
             st.plotly_chart(fig, use_container_width=True)
             
             # 堆叠面积图
-            price_trends = filtered_df.groupby(['main_category', 'rating'])['discounted_price'].mean().reset_index()
+            price_trends = filtered_df.groupby(['main_category', 'rating'], observed=True)['discounted_price'].mean().reset_index()
             fig = px.area(price_trends, 
                          x="rating", 
                          y="discounted_price",
@@ -1,9 +1,16 @@
+import argparse
 import pandas as pd
 import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 
-def clean_text(text):
-    """清理文本数据"""
+from profiling import span
+from storage import CATEGORICAL_COLUMNS, PROCESSED_PATH, RAW_PATH, save_processed
+
+def _clean_text_reference(text):
+    """原始的逐步清洗实现，仅用于校验 clean_text 的输出"""
     if not isinstance(text, str):
         return ''
     
@@ -33,41 +40,149 @@ def clean_text(text):
     
     return text.strip()
 
-def load_data(file_path):
-    """加载数据并进行基础清洗"""
-    # 读取CSV文件
-    df = pd.read_csv(file_path)
-    
-    # 处理价格列
-    df['discounted_price'] = df['discounted_price'].str.replace('₹','').str.replace(',','').astype(float)
-    df['actual_price'] = df['actual_price'].str.replace('₹','').str.replace(',','').astype(float)
-    
-    # 处理评论数列
-    df['rating_count'] = df['rating_count'].str.replace(',','').astype(float)
-    
-    # 处理评分列
-    df['rating'] = pd.to_numeric(df['rating'], errors='coerce')
+# clean_text 使用的预编译正则
+_URL_PATTERN = re.compile(r'http\S+|www\S+|https\S+')
+_SPACE_RUN = re.compile(r' {2,}')
+_WHITESPACE = re.compile(r'\s')
+_WORD_CHAR = re.compile(r'\w')
+_ASCII_LETTER = re.compile(r'[a-zA-Z]')
+# 待删除字符的占位符：先参与空格合并判断，合并后再统一删除
+_DELETE_MARK = '\x00'
+
+class _CleanTable(dict):
+    """str.translate 使用的字符映射表，首次遇到某字符时分类并缓存
+
+    与原始清洗步骤逐字符对应：
+        逗号、空白字符、除 .!? 以外的非单词字符 -> 空格
+        ASCII 字母                            -> 保留
+        .!?、数字、下划线及其他单词字符         -> 先占位，合并空格后删除
+    """
+
+    def __missing__(self, code):
+        char = chr(code)
+        if char == ',' or _WHITESPACE.match(char):
+            value = ' '
+        elif _ASCII_LETTER.match(char):
+            value = char
+        elif char in '.!?' or _WORD_CHAR.match(char):
+            value = _DELETE_MARK
+        else:
+            value = ' '
+        self[code] = value
+        return value
+
+_CLEAN_TABLE = _CleanTable()
+
+def clean_text(text):
+    """清理文本数据
+
+    单次遍历实现，输出与 _clean_text_reference 的七步正则逐字节一致：
+    小写 -> 去URL -> 逐字符映射 -> 合并空格 -> 删除占位符 -> 去首尾空格
+    """
+    if not isinstance(text, str):
+        return ''
     
-    # 计算真实折扣率
-    df['real_discount'] = df['discount_percentage'].str.rstrip('%').astype(float)
+    text = _URL_PATTERN.sub('', text.lower())
+    text = text.translate(_CLEAN_TABLE)
+    # 原实现先合并空白再删除数字和标点，因此被删除字符两侧的空格不会合并
+    text = _SPACE_RUN.sub(' ', text)
+    return text.replace(_DELETE_MARK, '').strip()
+
+def benchmark_clean_text(texts, repeat=3):
+    """校验 clean_text 与原始实现输出完全一致，并比较两者耗时"""
+    texts = list(texts)
+    mismatches = [t for t in texts if clean_text(t) != _clean_text_reference(t)]
+    if mismatches:
+        raise AssertionError(f"clean_text 与原始实现不一致: {len(mismatches)} 条，例如 {mismatches[0]!r}")
+
+    timings = {}
+    for name, func in [('reference', _clean_text_reference), ('clean_text', clean_text)]:
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for text in texts:
+                func(text)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+
+    print(f"校验通过: {len(texts)} 条文本输出完全一致")
+    print(f"原始实现: {timings['reference']:.3f}s, 新实现: {timings['clean_text']:.3f}s "
+          f"(提速 {timings['reference'] / timings['clean_text']:.1f}x)")
+    return timings
+
+# 原始数值列的解析规则: 原始列 -> (目标列, 类型)
+#   currency: "₹1,099" -> 1099.0
+#   count:    "24,269" -> 24269，填充缺失值后压缩为整数
+#   percent:  "64%"    -> 64.0
+#   number:   无法解析的值记为缺失
+PARSE_SCHEMA = {
+    'discounted_price': ('discounted_price', 'currency'),
+    'actual_price': ('actual_price', 'currency'),
+    'rating_count': ('rating_count', 'count'),
+    'discount_percentage': ('real_discount', 'percent'),
+    'rating': ('rating', 'number')
+}
+# 各类型需要去除的字符
+_STRIP_PATTERNS = {
+    'currency': re.compile(r'[₹,]'),
+    'count': re.compile(r','),
+    'percent': re.compile(r'%')
+}
+# 需要按字符串解析的列，分块读取时避免各块推断出不同的类型
+RAW_STRING_COLUMNS = {col: str for col, (_, kind) in PARSE_SCHEMA.items() if kind in _STRIP_PATTERNS}
+
+def parse_numeric(series, kind):
+    """按类型将字符串列一次性解析为float32"""
+    if kind == 'number':
+        return pd.to_numeric(series, errors='coerce').astype(np.float32)
+    stripped = series.str.replace(_STRIP_PATTERNS[kind], '', regex=True)
+    return pd.to_numeric(stripped).astype(np.float32)
+
+def parse_columns(df):
+    """按 PARSE_SCHEMA 解析所有数值列"""
+    for source, (target, kind) in PARSE_SCHEMA.items():
+        df[target] = parse_numeric(df[source], kind)
+    return df
+
+def _compact_types(df):
+    """压缩列类型：计数列转为整数，类别列转为category"""
+    for source, (target, kind) in PARSE_SCHEMA.items():
+        values = df[target]
+        if kind == 'count' and values.notna().all() and (values == np.floor(values)).all():
+            df[target] = pd.to_numeric(values.astype(np.int64), downcast='integer')
+    for col in CATEGORICAL_COLUMNS:
+        df[col] = df[col].astype('category')
+    return df
+
+def _parse_chunk(df):
+    """逐行处理部分：数值解析、类别提取和文本清洗，可按块独立执行"""
+    # 解析价格、评论数、评分和折扣率
+    with span('preprocess.parse_columns', rows=len(df)):
+        df = parse_columns(df)
     
     # 添加产品类别分类
     df['main_category'] = df['category'].str.split('|').str[0]
     
-    # 清理评论文本
-    df['review_title'] = df['review_title'].fillna('')
-    df['review_content'] = df['review_content'].fillna('')
-    df['cleaned_review'] = (df['review_title'] + ' ' + df['review_content']).apply(clean_text)
-    
-    # 清理产品描述
-    df['about_product'] = df['about_product'].fillna('')
-    df['cleaned_about'] = df['about_product'].apply(clean_text)
+    with span('preprocess.clean_text', rows=len(df)):
+        # 清理评论文本
+        df['review_title'] = df['review_title'].fillna('')
+        df['review_content'] = df['review_content'].fillna('')
+        df['cleaned_review'] = (df['review_title'] + ' ' + df['review_content']).apply(clean_text)
+        
+        # 清理产品描述
+        df['about_product'] = df['about_product'].fillna('')
+        df['cleaned_about'] = df['about_product'].apply(clean_text)
     
+    return df
+
+def _impute_and_filter(df):
+    """全局处理部分：中位数填充和异常值过滤，需要在完整数据上执行"""
     # 处理数值列的缺失值和异常值
     # 使用中位数填充数值型特征的缺失值
     numeric_cols = ['discounted_price', 'actual_price', 'rating', 'rating_count', 'real_discount']
     for col in numeric_cols:
         df[col] = df[col].fillna(df[col].median())
+    df = _compact_types(df)
     
     # 移除异常值（价格和评论数为0或极端值的记录）
     df = df[
@@ -85,6 +200,201 @@ def load_data(file_path):
     
     return df
 
+def _iter_parsed_chunks(file_path, chunksize, workers):
+    """分块读取并在进程池中处理，按原始顺序逐块返回
+
+    同时在途的块数不超过 workers * 2，内存占用由块大小决定。
+    """
+    reader = pd.read_csv(file_path, chunksize=chunksize, dtype=RAW_STRING_COLUMNS)
+    if workers <= 1:
+        for chunk in reader:
+            yield _parse_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in reader:
+            pending.append(executor.submit(_parse_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def load_data(file_path, chunksize=None, workers=1):
+    """加载数据并进行基础清洗
+
+    指定chunksize时分块读取，并用workers个进程并行解析和清洗；
+    中位数填充和过滤仍在合并后的完整数据上执行，结果与一次性读取相同。
+    """
+    with span('preprocess.load') as record:
+        if chunksize is None:
+            # 读取CSV文件
+            df = _parse_chunk(pd.read_csv(file_path, dtype=RAW_STRING_COLUMNS))
+        else:
+            df = pd.concat(_iter_parsed_chunks(file_path, chunksize, workers), ignore_index=True)
+        record['rows'] = len(df)
+    
+    with span('preprocess.impute_filter', rows=len(df)):
+        return _impute_and_filter(df)
+
+# 分箱等级标签：将数据分成5个等级
+SEGMENT_LABELS = ['very_low', 'low', 'medium', 'high', 'very_high']
+
+def _safe_qcut_reference(x):
+    """原始的单组分箱实现，仅用于校验 group_qcut 的输出"""
+    try:
+        # 尝试创建等频分箱（每个区间数据量相等）
+        return pd.qcut(x, q=5, labels=SEGMENT_LABELS)
+    except ValueError:
+        # 处理特殊情况
+        if len(x.unique()) == 1:  # 如果所有值都相同
+            return pd.Series(['medium'] * len(x), index=x.index)
+        # 如果不同值的数量少于5个
+        n_unique = min(len(x.unique()), 5)
+        try:
+            return pd.qcut(x, q=n_unique, labels=SEGMENT_LABELS[:n_unique])
+        except ValueError:
+            # 如果等频分箱失败，使用等宽分箱
+            return pd.cut(x, bins=n_unique, labels=SEGMENT_LABELS[:n_unique])
+
+def _qcut_probabilities(q):
+    """pd.qcut 实际使用的分位概率
+
+    pandas 3 会把不能精确表示的分位概率向上取下一个浮点数；
+    pandas 2 经由 np.percentile 计算，概率先乘100再除100。
+    两者在重复值处会影响分位点是否重复，需与所装版本保持一致。
+    """
+    probs = np.linspace(0, 1, q + 1)
+    if int(pd.__version__.split('.')[0]) >= 3:
+        np.putmask(probs, q * probs != np.arange(q + 1), np.nextafter(probs, 1))
+        return probs
+    return np.true_divide(probs * 100.0, 100)
+
+def _group_quantile_edges(sorted_values, starts, counts, q):
+    """在组内有序的数组上一次性计算各组的q等分位点
+
+    使用与 np.quantile 相同的线性插值，返回形状为 (组数, q+1) 的分位点。
+    """
+    probs = _qcut_probabilities(q)
+    last = (counts - 1)[:, None]
+    virtual = last * probs[None, :]
+    lower = np.floor(virtual)
+    gamma = virtual - lower
+    lower_idx = np.minimum(lower.astype(np.int64), last)
+    upper_idx = np.minimum(lower_idx + 1, last)
+
+    a = sorted_values[starts[:, None] + lower_idx]
+    b = sorted_values[starts[:, None] + upper_idx]
+    diff = b - a
+    # 与 numpy 的 _lerp 相同：gamma >= 0.5 时从右端点反向插值
+    return np.where(gamma >= 0.5, b - diff * (1 - gamma), a + diff * gamma)
+
+def group_qcut(values, groups, q=5):
+    """按组等频分箱，对不含NaN的输入结果与逐组调用 _safe_qcut_reference 相同
+
+    NaN 不参与分箱、结果为缺失，也不计入不同取值数；而原始实现在回退分支中会把
+    NaN 算作一个取值，因此含NaN的组结果可能不同。load_data 在分箱前已填充缺失值。
+
+    先按 (组, 值) 排序一次，向量化计算所有组的分位点，再按组内分位点计数得到等级：
+        1. 分位点严格递增时按q等分
+        2. 组内只有一个取值时记为medium
+        3. 否则按 min(不同取值数, q) 重新等分，仍有重复分位点时改用等宽分箱
+    """
+    values = pd.Series(values)
+    codes, _ = pd.factorize(pd.Series(groups, index=values.index), sort=True)
+    raw = values.to_numpy()
+    valid = (codes >= 0) & ~pd.isna(raw)
+
+    positions = np.flatnonzero(valid)
+    group_codes = codes[valid]
+    order = np.lexsort((raw[valid], group_codes))
+    sorted_values = raw[valid][order]
+    sorted_codes = group_codes[order]
+
+    # 各组在有序数组中的起点、长度和不同取值数
+    n_groups = codes.max() + 1 if len(positions) else 0
+    counts = np.bincount(sorted_codes, minlength=n_groups)
+    present = np.flatnonzero(counts)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    is_new_value = np.ones(len(sorted_values), dtype=bool)
+    is_new_value[1:] = (sorted_values[1:] != sorted_values[:-1]) | (sorted_codes[1:] != sorted_codes[:-1])
+    n_unique = np.bincount(sorted_codes[is_new_value], minlength=n_groups)
+
+    # 每组的内部分界点（不含首尾），不足q个等级的组用inf补齐
+    inner_edges = np.full((n_groups, q - 1), np.inf)
+    constant = np.zeros(n_groups, dtype=bool)
+    unresolved = present
+
+    for k in [q] + sorted(set(np.minimum(n_unique[present], q)) - {q, 1}, reverse=True):
+        if k == q:
+            candidates = unresolved
+        else:
+            candidates = unresolved[np.minimum(n_unique[unresolved], q) == k]
+        if len(candidates) == 0:
+            continue
+        edges = _group_quantile_edges(sorted_values, starts[candidates], counts[candidates], k)
+        strictly_increasing = (np.diff(edges, axis=1) > 0).all(axis=1)
+        done = candidates[strictly_increasing]
+        inner_edges[done, :k - 1] = edges[strictly_increasing, 1:-1]
+        unresolved = np.setdiff1d(unresolved, done)
+
+        if k == q:
+            # 只有一个取值的组不再尝试其他分箱
+            single = unresolved[n_unique[unresolved] == 1]
+            constant[single] = True
+            unresolved = np.setdiff1d(unresolved, single)
+
+    # 等频分箱失败的组改用等宽分箱（与 pd.cut 的分界计算方式一致）
+    for g in unresolved:
+        k = min(n_unique[g], q)
+        group_values = sorted_values[starts[g]:starts[g] + counts[g]]
+        mn, mx = group_values[0], group_values[-1]
+        bins = np.linspace(mn, mx, k + 1, endpoint=True)
+        inner_edges[g, :k - 1] = bins[1:-1]
+
+    # 等级 = 组内严格小于该值的内部分界点个数
+    label_idx = (inner_edges[group_codes] < raw[valid][:, None]).sum(axis=1)
+    label_idx[constant[group_codes]] = SEGMENT_LABELS.index('medium')
+
+    result = np.full(len(raw), np.nan, dtype=object)
+    result[positions] = np.asarray(SEGMENT_LABELS, dtype=object)[label_idx]
+    return pd.Series(pd.Categorical(result, categories=SEGMENT_LABELS), index=values.index)
+
+def benchmark_group_qcut(df, columns=('discounted_price', 'rating_count'), repeat=3):
+    """校验 group_qcut 与逐组调用 _safe_qcut_reference 的输出完全一致，并比较两者耗时
+
+    df 应为 load_data 的输出（已填充缺失值），按 main_category 分组。
+    """
+    def reference(column):
+        return df.groupby('main_category', observed=True)[column].transform(_safe_qcut_reference)
+
+    def vectorized(column):
+        return group_qcut(df[column], df['main_category'])
+
+    for column in columns:
+        expected = reference(column).astype(str).to_numpy()
+        actual = vectorized(column).astype(str).to_numpy()
+        mismatches = np.flatnonzero(expected != actual)
+        if len(mismatches):
+            i = mismatches[0]
+            raise AssertionError(f"{column}: group_qcut 与原始实现不一致: {len(mismatches)} 行，"
+                                 f"例如第 {i} 行 {actual[i]!r} != {expected[i]!r}")
+
+    timings = {}
+    for name, func in [('reference', reference), ('group_qcut', vectorized)]:
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for column in columns:
+                func(column)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+
+    print(f"校验通过: {len(df)} 行 × {len(columns)} 列分箱结果完全一致")
+    print(f"原始实现: {timings['reference']:.3f}s, 新实现: {timings['group_qcut']:.3f}s "
+          f"(提速 {timings['reference'] / timings['group_qcut']:.1f}x)")
+    return timings
+
 def extract_features(df):
     """特征工程"""
     features = pd.DataFrame()
@@ -96,41 +406,29 @@ def extract_features(df):
     features['discount'] = df['real_discount']
     features['main_category'] = df['main_category']
     
-    # 创建分箱函数：将数据分成5个等级
-    def safe_qcut(x):
-        try:
-            # 尝试创建等频分箱（每个区间数据量相等）
-            return pd.qcut(x, q=5, labels=['very_low', 'low', 'medium', 'high', 'very_high'])
-        except ValueError:
-            # 处理特殊情况
-            if len(x.unique()) == 1:  # 如果所有值都相同
-                return pd.Series(['medium'] * len(x), index=x.index)
-            # 如果不同值的数量少于5个
-            n_unique = min(len(x.unique()), 5)
-            try:
-                return pd.qcut(x, q=n_unique, labels=['very_low', 'low', 'medium', 'high', 'very_high'][:n_unique])
-            except ValueError:
-                # 如果等频分箱失败，使用等宽分箱
-                return pd.cut(x, bins=n_unique, labels=['very_low', 'low', 'medium', 'high', 'very_high'][:n_unique])
-    
-    # 创建价格区间特征（按类别分组后计算相对价格水平）
-    df['price_segment'] = df.groupby('main_category')['discounted_price'].transform(safe_qcut)
-    features['price_segment'] = df['price_segment']
-    
-    # 创建受欢迎程度特征（按类别分组后计算相对评论数量水平）
-    df['popularity'] = df.groupby('main_category')['rating_count'].transform(safe_qcut)
-    features['popularity'] = df['popularity']
+    with span('features.binning', rows=len(df)):
+        # 创建价格区间特征（按类别分组后计算相对价格水平）
+        df['price_segment'] = group_qcut(df['discounted_price'], df['main_category'])
+        features['price_segment'] = df['price_segment']
+        
+        # 创建受欢迎程度特征（按类别分组后计算相对评论数量水平）
+        df['popularity'] = group_qcut(df['rating_count'], df['main_category'])
+        features['popularity'] = df['popularity']
     
     return features
 
 def get_category_stats(df):
     """获取各类别的统计信息"""
-    stats = df.groupby('main_category').agg({
+    stats = df.groupby('main_category', observed=True).agg({
         'discounted_price': ['count', 'mean', 'std', 'min', 'max'],
         'rating': ['mean', 'std'],
         'rating_count': ['sum', 'mean'],
         'real_discount': ['mean', 'std']
-    }).round(2)
+    })
+    # float32 列转为 float64 后再取整，避免显示精度噪声
+    float32_cols = stats.select_dtypes(include=[np.float32]).columns
+    stats[float32_cols] = stats[float32_cols].astype(np.float64)
+    stats = stats.round(2)
     
     # 添加产品数量占比
     total_products = df['main_category'].count()
@@ -138,12 +436,12 @@ def get_category_stats(df):
     
     return stats
 
-def main():
+def main(chunksize=None, workers=1, input_path=RAW_PATH, output_path=PROCESSED_PATH):
     """测试数据处理功能"""
     # 测试数据加载和清理
     print("=== 测试数据加载和清理 ===")
     try:
-        df = load_data('data/amazon.csv')
+        df = load_data(input_path, chunksize=chunksize, workers=workers)
         print("\n数据样例:")
         print(df[['product_name', 'main_category', 'discounted_price', 'cleaned_review']].head())
         
@@ -161,12 +459,29 @@ def main():
         
         # 保存处理后的数据
         print("\n=== 保存处理后的数据 ===")
-        df.to_csv('data/processed_amazon.csv', index=False)
-        print("数据已保存到 data/processed_amazon.csv")
+        save_processed(df, output_path)
+        print(f"数据已保存到 {output_path}")
         
     except Exception as e:
         print(f"错误: {str(e)}")
-        print("请确保数据文件位于 data/amazon.csv")
+        print(f"请确保数据文件位于 {input_path}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='数据预处理')
+    parser.add_argument('--chunksize', type=int, help='分块读取的行数（默认一次性读取）')
+    parser.add_argument('--workers', type=int, default=1, help='分块解析和清洗的进程数')
+    parser.add_argument('--bench-clean', action='store_true', help='在真实数据集上校验并测速 clean_text')
+    parser.add_argument('--bench-qcut', action='store_true', help='在真实数据集上校验并测速 group_qcut')
+    args = parser.parse_args()
+
+    if args.bench_clean:
+        # 在真实数据集上校验并测速 clean_text
+        raw = pd.read_csv(RAW_PATH)
+        texts = (raw['review_title'].fillna('') + ' ' + raw['review_content'].fillna('')).tolist()
+        texts += raw['about_product'].fillna('').tolist()
+        benchmark_clean_text(texts)
+    elif args.bench_qcut:
+        # 在真实数据集上校验并测速 group_qcut
+        benchmark_group_qcut(load_data(RAW_PATH))
+    else:
+        main(chunksize=args.chunksize, workers=args.workers)
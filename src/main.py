@@ -1,71 +1,45 @@
+import argparse
 import pandas as pd
 import os
+import time
 from datetime import datetime
 import pytz
 
-# 项目路径配置
-REPORT_DIR = '../outputs'
+from profiling import span
+from storage import PROCESSED_PATH, load_processed
+
+# 项目路径配置（与当前工作目录无关）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPORT_DIR = os.path.join(ROOT_DIR, 'outputs')
+# 报告的输入：处理后的数据和价格建议
+PROCESSED_INPUT = os.path.join(ROOT_DIR, PROCESSED_PATH)
+RECOMMENDATIONS_INPUT = os.path.join(ROOT_DIR, 'data', 'price_recommendations.csv')
+# 报告需要读取的列
+REPORT_COLUMNS = [
+    'product_id', 'product_name', 'main_category', 'real_discount', 'rating', 'rating_count',
+    'sentiment', 'sentiment_score'
+]
 # 创建必要的目录
 os.makedirs(REPORT_DIR, exist_ok=True)
 
-def generate_report():
-    """生成中英文分析报告"""
-    try:
-        # 加载数据
-        df = pd.read_csv('data/processed_amazon.csv')
-        recommendations = pd.read_csv('data/price_recommendations.csv')
-        
-        # 计算基本统计信息
-        total_products = len(recommendations)
-        
-        # 价格调整统计
-        price_changes = recommendations['adjusted_change']
-        increase_mask = price_changes > 0
-        decrease_mask = price_changes < 0
-        no_change_mask = abs(price_changes) < 3
-        
-        increases = sum(increase_mask)
-        decreases = sum(decrease_mask)
-        no_changes = sum(no_change_mask)
-        
-        # 收入影响
-        current_revenue = recommendations['current_revenue'].sum()
-        expected_revenue = recommendations['expected_revenue'].sum()
-        revenue_change = ((expected_revenue - current_revenue) / current_revenue * 100)
-        
-        # 情感分析统计
-        total_reviews = len(df)
-        positive_reviews = sum(df['sentiment'] == 'POSITIVE')
-        negative_reviews = sum(df['sentiment'] == 'NEGATIVE')
-        avg_sentiment = df['sentiment_score'].mean()
-        
-        # 获取北京时间
-        beijing_tz = pytz.timezone('Asia/Shanghai')
-        beijing_time = datetime.now(beijing_tz)
-        
-        # 生成报告
-        report_path = os.path.join(REPORT_DIR, 'pricing_strategy_report.md')
-        with open(report_path, 'w', encoding='utf-8') as f:
-            # 英文部分
-            f.write(f"""# Cross-border E-commerce Pricing Strategy Optimization / 跨境电商产品定价策略优化
-
-[English](#english) | [中文](#chinese)
-
-## English
-
-### Amazon Product Pricing Strategy Analysis Report
+# 报告模板：每种语言一组，占位符对应 compute_report_metrics 返回的指标
+REPORT_TEMPLATES = {
+    'en': {
+        'label': 'English',
+        'heading': 'English',
+        'overview': """### Amazon Product Pricing Strategy Analysis Report
 
 #### 1. Market Overview 📊
 - **Total Products Analyzed**: {total_products:,}
-- **Average Rating**: {df['rating'].mean():.2f} ⭐
-- **Average Discount**: {df['discount_percentage'].str.rstrip('%').astype(float).mean():.1f}%
+- **Average Rating**: {avg_rating:.2f} ⭐
+- **Average Discount**: {avg_discount:.1f}%
 
 #### 2. Sentiment Analysis 💭
 ##### Overall Sentiment Distribution
 - **Total Reviews**: {total_reviews:,}
-- **Positive Reviews**: {positive_reviews:,} ({positive_reviews/total_reviews*100:.1f}%)
-- **Negative Reviews**: {negative_reviews:,} ({negative_reviews/total_reviews*100:.1f}%)
-- **Positive to Negative Ratio**: {positive_reviews}:{negative_reviews} ({positive_reviews/negative_reviews:.2f}:1)
+- **Positive Reviews**: {positive_reviews:,} ({positive_pct:.1f}%)
+- **Negative Reviews**: {negative_reviews:,} ({negative_pct:.1f}%)
+- **Positive to Negative Ratio**: {positive_reviews}:{negative_reviews} ({sentiment_ratio:.2f}:1)
 - **Average Sentiment Score**: {avg_sentiment:.2f}
 
 ##### Sentiment Distribution Characteristics
@@ -75,48 +49,30 @@ def generate_report():
 
 #### 3. Price Adjustment Suggestions 💰
 ##### Price Adjustment Distribution
-- **Recommended Increases**: {increases:,} products ({increases/total_products*100:.1f}%)
-- **Recommended Decreases**: {decreases:,} products ({decreases/total_products*100:.1f}%)
-- **Maintain Current Price**: {no_changes:,} products ({no_changes/total_products*100:.1f}%)
+- **Recommended Increases**: {increases:,} products ({increase_pct:.1f}%)
+- **Recommended Decreases**: {decreases:,} products ({decrease_pct:.1f}%)
+- **Maintain Current Price**: {no_changes:,} products ({no_change_pct:.1f}%)
 
 ##### Adjustment Range
-- **Maximum Increase**: {price_changes.max():.1f}%
-- **Maximum Decrease**: {price_changes.min():.1f}%
-- **Average Adjustment**: {price_changes.mean():.1f}%
+- **Maximum Increase**: {max_change:.1f}%
+- **Maximum Decrease**: {min_change:.1f}%
+- **Average Adjustment**: {mean_change:.1f}%
 
 ##### Revenue Impact
 - **Current Total Revenue**: ₹{current_revenue:,.2f}
 - **Expected Total Revenue**: ₹{expected_revenue:,.2f}
 - **Expected Growth**: {revenue_change:.1f}%
 
-#### 4. Key Products to Watch ⭐
-
-##### Top Price Increases (Top 5)""")
-
-            # 添加英文版最大提价产品
-            top_increases = recommendations.nlargest(5, 'adjusted_change')
-            for _, row in top_increases.iterrows():
-                product = df[df['product_id'] == row['product_id']].iloc[0]
-                f.write(f"""
-- **{product['product_name'][:50]}...**
-  - Current Price: ₹{row['current_price']:.2f}
-  - Recommended Price: ₹{row['recommended_price']:.2f} (+{row['adjusted_change']:.1f}%)
-  - Rating: {product['rating']}⭐ ({product['rating_count']} Reviews)
-  - Sentiment Score: {product['sentiment_score']:.2f}""")
-
-            f.write("\n\n##### Top Price Decreases (Top 5)")
-            # 添加英文版最大降价产品
-            top_decreases = recommendations.nsmallest(5, 'adjusted_change')
-            for _, row in top_decreases.iterrows():
-                product = df[df['product_id'] == row['product_id']].iloc[0]
-                f.write(f"""
-- **{product['product_name'][:50]}...**
-  - Current Price: ₹{row['current_price']:.2f}
-  - Recommended Price: ₹{row['recommended_price']:.2f} ({row['adjusted_change']:.1f}%)
-  - Rating: {product['rating']}⭐ ({product['rating_count']} Reviews)
-  - Sentiment Score: {product['sentiment_score']:.2f}""")
-
-            f.write(f"""
+#### 4. Key Products to Watch ⭐""",
+        'increases_title': "\n\n##### Top Price Increases (Top {top_n})",
+        'decreases_title': "\n\n##### Top Price Decreases (Top {top_n})",
+        'product': """
+- **{short_name}...**
+  - Current Price: ₹{current_price:.2f}
+  - Recommended Price: ₹{recommended_price:.2f} ({sign}{adjusted_change:.1f}%)
+  - Rating: {rating:.1f}⭐ ({rating_count} Reviews)
+  - Sentiment Score: {sentiment_score:.2f}""",
+        'strategy': """
 
 #### 5. Strategic Recommendations 📈
 
@@ -150,23 +106,34 @@ def generate_report():
 3. **Marketing Strategy**
    - Highlight advantages of high-rated products
    - Targeted promotions for low-rated products
-   - Strengthen brand image
-
-## Chinese
-
-### 亚马逊产品定价策略分析报告
+   - Strengthen brand image""",
+        'categories_title': "\n\n#### 6. Category Breakdown 🗂️",
+        'category': """
+
+##### {category}
+- **Products**: {products:,}
+- **Recommended Increases / Decreases**: {increases:,} / {decreases:,}
+- **Average Adjustment**: {mean_change:.1f}%
+- **Revenue Impact**: ₹{current_revenue:,.2f} → ₹{expected_revenue:,.2f} ({revenue_change:+.1f}%)
+- **Top Movers**:""",
+        'mover': "\n  - {short_name}...: {adjusted_change:+.1f}% (₹{current_price:.2f} → ₹{recommended_price:.2f})"
+    },
+    'zh': {
+        'label': '中文',
+        'heading': 'Chinese',
+        'overview': """### 亚马逊产品定价策略分析报告
 
 #### 1. 市场概况 📊
 - **分析产品总数**: {total_products:,}
-- **平均评分**: {df['rating'].mean():.2f} ⭐
-- **平均折扣率**: {df['discount_percentage'].str.rstrip('%').astype(float).mean():.1f}%
+- **平均评分**: {avg_rating:.2f} ⭐
+- **平均折扣率**: {avg_discount:.1f}%
 
 #### 2. 情感分析 💭
 ##### 总体情感分布
 - **评论总数**: {total_reviews:,}
-- **正面评价**: {positive_reviews:,} ({positive_reviews/total_reviews*100:.1f}%)
-- **负面评价**: {negative_reviews:,} ({negative_reviews/total_reviews*100:.1f}%)
-- **正负比例**: {positive_reviews}:{negative_reviews} ({positive_reviews/negative_reviews:.2f}:1)
+- **正面评价**: {positive_reviews:,} ({positive_pct:.1f}%)
+- **负面评价**: {negative_reviews:,} ({negative_pct:.1f}%)
+- **正负比例**: {positive_reviews}:{negative_reviews} ({sentiment_ratio:.2f}:1)
 - **平均情感得分**: {avg_sentiment:.2f}
 
 ##### 情感分布特点
@@ -176,46 +143,30 @@ def generate_report():
 
 #### 3. 价格调整建议 💰
 ##### 调价分布
-- **建议提价**: {increases:,} 个产品 ({increases/total_products*100:.1f}%)
-- **建议降价**: {decreases:,} 个产品 ({decreases/total_products*100:.1f}%)
-- **维持现价**: {no_changes:,} 个产品 ({no_changes/total_products*100:.1f}%)
+- **建议提价**: {increases:,} 个产品 ({increase_pct:.1f}%)
+- **建议降价**: {decreases:,} 个产品 ({decrease_pct:.1f}%)
+- **维持现价**: {no_changes:,} 个产品 ({no_change_pct:.1f}%)
 
 ##### 调价幅度
-- **最大提价**: {price_changes.max():.1f}%
-- **最大降价**: {price_changes.min():.1f}%
-- **平均调整**: {price_changes.mean():.1f}%
+- **最大提价**: {max_change:.1f}%
+- **最大降价**: {min_change:.1f}%
+- **平均调整**: {mean_change:.1f}%
 
 ##### 收入影响
 - **当前总收入**: ₹{current_revenue:,.2f}
 - **预期总收入**: ₹{expected_revenue:,.2f}
 - **预期增长**: {revenue_change:.1f}%
 
-#### 4. 重点关注产品 ⭐
-
-##### 最大提价产品 (Top 5)""")
-
-            # 添加中文版最大提价产品
-            for _, row in top_increases.iterrows():
-                product = df[df['product_id'] == row['product_id']].iloc[0]
-                f.write(f"""
-- **{product['product_name'][:50]}...**
-  - 当前价格: ₹{row['current_price']:.2f}
-  - 建议价格: ₹{row['recommended_price']:.2f} (+{row['adjusted_change']:.1f}%)
-  - 评分: {product['rating']}⭐ ({product['rating_count']} 评论)
-  - 情感得分: {product['sentiment_score']:.2f}""")
-
-            f.write("\n\n##### 最大降价产品 (Top 5)")
-            # 添加中文版最大降价产品
-            for _, row in top_decreases.iterrows():
-                product = df[df['product_id'] == row['product_id']].iloc[0]
-                f.write(f"""
-- **{product['product_name'][:50]}...**
-  - 当前价格: ₹{row['current_price']:.2f}
-  - 建议价格: ₹{row['recommended_price']:.2f} ({row['adjusted_change']:.1f}%)
-  - 评分: {product['rating']}⭐ ({product['rating_count']} 评论)
-  - 情感得分: {product['sentiment_score']:.2f}""")
-
-            f.write(f"""
+#### 4. 重点关注产品 ⭐""",
+        'increases_title': "\n\n##### 最大提价产品 (Top {top_n})",
+        'decreases_title': "\n\n##### 最大降价产品 (Top {top_n})",
+        'product': """
+- **{short_name}...**
+  - 当前价格: ₹{current_price:.2f}
+  - 建议价格: ₹{recommended_price:.2f} ({sign}{adjusted_change:.1f}%)
+  - 评分: {rating:.1f}⭐ ({rating_count} 评论)
+  - 情感得分: {sentiment_score:.2f}""",
+        'strategy': """
 
 #### 5. 策略建议 📈
 
@@ -249,16 +200,234 @@ def generate_report():
 3. **营销策略**
    - 突出高评分产品优势
    - 针对性促销低评分产品
-   - 加强品牌形象建设
+   - 加强品牌形象建设""",
+        'categories_title': "\n\n#### 6. 类别分析 🗂️",
+        'category': """
+
+##### {category}
+- **产品数**: {products:,}
+- **建议提价 / 降价**: {increases:,} / {decreases:,}
+- **平均调整**: {mean_change:.1f}%
+- **收入影响**: ₹{current_revenue:,.2f} → ₹{expected_revenue:,.2f} ({revenue_change:+.1f}%)
+- **变动最大的产品**:""",
+        'mover': "\n  - {short_name}...: {adjusted_change:+.1f}% (₹{current_price:.2f} → ₹{recommended_price:.2f})"
+    }
+}
+# 默认输出的语言
+LOCALES = ['en', 'zh']
+
+def flagged_products(df, recommendations, top_n=5):
+    """取调价幅度最大和最小的 top_n 个产品，并关联其产品信息
+
+    先按哈希筛出被选中的产品，再按 product_id 建索引做一次关联（重复的 product_id
+    取第一条），只扫描产品表一次。返回 (最大提价产品, 最大降价产品)。
+    """
+    top_increases = recommendations.nlargest(top_n, 'adjusted_change')
+    top_decreases = recommendations.nsmallest(top_n, 'adjusted_change')
+    flagged_ids = pd.concat([top_increases['product_id'], top_decreases['product_id']]).unique()
+    products = (df[df['product_id'].isin(flagged_ids)]
+                .drop_duplicates('product_id')
+                .set_index('product_id'))
+    return (
+        top_increases.join(products, on='product_id', rsuffix='_product'),
+        top_decreases.join(products, on='product_id', rsuffix='_product')
+    )
+
+def _flagged_products_scan(df, recommendations, top_n=5):
+    """逐个产品扫描整列查找（原实现，仅用于基准测试对比）"""
+    result = []
+    for top in (recommendations.nlargest(top_n, 'adjusted_change'),
+                recommendations.nsmallest(top_n, 'adjusted_change')):
+        result.append([df[df['product_id'] == row['product_id']].iloc[0] for _, row in top.iterrows()])
+    return result
+
+def benchmark_product_lookup(df, recommendations, sizes=(10, 100, 1000, 5000), repeat=3):
+    """比较逐行扫描与索引关联两种产品查找方式在不同 top_n 下的耗时"""
+    print(f"\n=== Product Lookup Benchmark ({len(df):,} products) ===")
+    for top_n in sizes:
+        top_n = min(top_n, len(recommendations))
+        timings = {}
+        for name, lookup in (('scan', _flagged_products_scan), ('join', flagged_products)):
+            best = float('inf')
+            for _ in range(repeat):
+                start_time = time.perf_counter()
+                lookup(df, recommendations, top_n)
+                best = min(best, time.perf_counter() - start_time)
+            timings[name] = best
+        print(f"top_n={top_n:>6}: scan {timings['scan']*1000:9.1f} ms, join {timings['join']*1000:7.1f} ms "
+              f"({timings['scan']/timings['join']:.0f}x)")
+
+def _product_items(products, sign=''):
+    """逐个产出产品的模板参数（产品名截断到50个字符）"""
+    for _, row in products.iterrows():
+        item = row.to_dict()
+        item['short_name'] = str(item['product_name'])[:50]
+        item['sign'] = sign
+        yield item
+
+def _percent(part, total):
+    return part / total * 100 if total else 0.0
+
+def compute_report_metrics(df, recommendations, top_n=5):
+    """计算报告的整体指标，各语言共用，只计算一次"""
+    total_products = len(recommendations)
+
+    # 价格调整统计
+    price_changes = recommendations['adjusted_change']
+    increases = int((price_changes > 0).sum())
+    decreases = int((price_changes < 0).sum())
+    no_changes = int((price_changes.abs() < 3).sum())
+
+    # 收入影响
+    current_revenue = recommendations['current_revenue'].sum()
+    expected_revenue = recommendations['expected_revenue'].sum()
+
+    # 情感分析统计
+    total_reviews = len(df)
+    positive_reviews = int((df['sentiment'] == 'POSITIVE').sum())
+    negative_reviews = int((df['sentiment'] == 'NEGATIVE').sum())
+
+    # 重点关注产品
+    top_increases, top_decreases = flagged_products(df, recommendations, top_n)
+
+    # 获取北京时间
+    beijing_time = datetime.now(pytz.timezone('Asia/Shanghai'))
+
+    return {
+        'top_n': top_n,
+        'total_products': total_products,
+        'avg_rating': df['rating'].mean(),
+        'avg_discount': df['real_discount'].mean(),
+        'total_reviews': total_reviews,
+        'positive_reviews': positive_reviews,
+        'negative_reviews': negative_reviews,
+        'positive_pct': _percent(positive_reviews, total_reviews),
+        'negative_pct': _percent(negative_reviews, total_reviews),
+        'sentiment_ratio': positive_reviews / negative_reviews if negative_reviews else float('inf'),
+        'avg_sentiment': df['sentiment_score'].mean(),
+        'increases': increases,
+        'decreases': decreases,
+        'no_changes': no_changes,
+        'increase_pct': _percent(increases, total_products),
+        'decrease_pct': _percent(decreases, total_products),
+        'no_change_pct': _percent(no_changes, total_products),
+        'max_change': price_changes.max(),
+        'min_change': price_changes.min(),
+        'mean_change': price_changes.mean(),
+        'current_revenue': current_revenue,
+        'expected_revenue': expected_revenue,
+        'revenue_change': (expected_revenue - current_revenue) / current_revenue * 100,
+        'top_increases': list(_product_items(top_increases, sign='+')),
+        'top_decreases': list(_product_items(top_decreases)),
+        'generated_at': beijing_time.strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+def compute_category_metrics(df, recommendations, movers=3):
+    """按 main_category 汇总调价和收入影响，并取每个类别变动最大的产品
+
+    所有类别由一次分组聚合和一次排序得到。
+    返回 (各类别指标, {类别: 变动最大的产品的模板参数列表})。
+    """
+    products = df.drop_duplicates('product_id').set_index('product_id')[['main_category', 'product_name']]
+    merged = recommendations.join(products, on='product_id')
+    merged['increase'] = merged['adjusted_change'] > 0
+    merged['decrease'] = merged['adjusted_change'] < 0
+
+    metrics = merged.groupby('main_category', observed=True, sort=True).agg(
+        products=('product_id', 'size'),
+        increases=('increase', 'sum'),
+        decreases=('decrease', 'sum'),
+        mean_change=('adjusted_change', 'mean'),
+        current_revenue=('current_revenue', 'sum'),
+        expected_revenue=('expected_revenue', 'sum')
+    )
+    metrics['revenue_change'] = (
+        (metrics['expected_revenue'] - metrics['current_revenue']) / metrics['current_revenue'] * 100
+    )
+
+    # 按调价幅度绝对值排序后每组取前几个
+    merged['abs_change'] = merged['adjusted_change'].abs()
+    top_movers = (merged.sort_values('abs_change', ascending=False, kind='stable')
+                  .groupby('main_category', observed=True, sort=False)
+                  .head(movers))
+    movers_by_category = {}
+    for item in top_movers[['main_category', 'product_name', 'adjusted_change',
+                            'current_price', 'recommended_price']].to_dict('records'):
+        item['short_name'] = str(item['product_name'])[:50]
+        movers_by_category.setdefault(item['main_category'], []).append(item)
+    return metrics, movers_by_category
+
+def render_locale(f, locale, metrics, category_metrics=None, movers_by_category=None):
+    """按模板把一种语言的报告写入文件，类别部分逐节写出"""
+    template = REPORT_TEMPLATES[locale]
+    f.write(f"## {template['heading']}\n\n")
+    f.write(template['overview'].format_map(metrics))
+    f.write(template['increases_title'].format_map(metrics))
+    for item in metrics['top_increases']:
+        f.write(template['product'].format_map(item))
+    f.write(template['decreases_title'].format_map(metrics))
+    for item in metrics['top_decreases']:
+        f.write(template['product'].format_map(item))
+    f.write(template['strategy'])
+
+    if category_metrics is not None and len(category_metrics):
+        f.write(template['categories_title'])
+        for row in category_metrics.itertuples():
+            f.write(template['category'].format_map(dict(row._asdict(), category=row.Index)))
+            for item in movers_by_category.get(row.Index, []):
+                f.write(template['mover'].format_map(item))
+    f.write("\n\n")
+
+def render_report(f, metrics, locales=LOCALES, category_metrics=None, movers_by_category=None):
+    """把报告写入文件：标题、每种语言一节、生成时间"""
+    f.write("# Cross-border E-commerce Pricing Strategy Optimization / 跨境电商产品定价策略优化\n\n")
+    f.write(" | ".join(
+        f"[{REPORT_TEMPLATES[locale]['label']}](#{REPORT_TEMPLATES[locale]['heading'].lower()})"
+        for locale in locales
+    ) + "\n\n")
+    for locale in locales:
+        render_locale(f, locale, metrics, category_metrics, movers_by_category)
+    f.write(f"---\n*Report Generation Time / 报告生成时间: {metrics['generated_at']}*\n")
+
+def generate_report(top_n=5, locales=LOCALES, movers=3):
+    """生成多语言分析报告
+
+    top_n: 重点关注产品的数量
+    locales: 报告语言，见 REPORT_TEMPLATES
+    movers: 每个类别列出的变动最大的产品数
+    """
+    try:
+        # 加载数据
+        df = load_processed(columns=REPORT_COLUMNS, path=PROCESSED_INPUT)
+        recommendations = pd.read_csv(RECOMMENDATIONS_INPUT)
+
+        # 指标只计算一次，各语言共用
+        with span('report.metrics', rows=len(recommendations)):
+            metrics = compute_report_metrics(df, recommendations, top_n)
+            category_metrics, movers_by_category = compute_category_metrics(df, recommendations, movers)
+
+        # 生成报告
+        report_path = os.path.join(REPORT_DIR, 'pricing_strategy_report.md')
+        with span('report.render'), open(report_path, 'w', encoding='utf-8') as f:
+            render_report(f, metrics, locales, category_metrics, movers_by_category)
 
----
-*Report Generation Time / 报告生成时间: {beijing_time.strftime('%Y-%m-%d %H:%M:%S')}*
-""")
-        
         print(f"报告已生成到 {report_path}")
-        
+
     except Exception as e:
         print(f"生成报告时出错: {str(e)}")
 
 if __name__ == "__main__":
-    generate_report() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='生成定价策略报告')
+    parser.add_argument('--top-n', type=int, default=5, help='重点关注产品的数量')
+    parser.add_argument('--locales', nargs='+', choices=list(REPORT_TEMPLATES), default=LOCALES,
+                        help='报告语言')
+    parser.add_argument('--movers', type=int, default=3, help='每个类别列出的变动最大的产品数')
+    parser.add_argument('--bench-lookup', action='store_true',
+                        help='比较逐行扫描与索引关联的产品查找耗时')
+    args = parser.parse_args()
+    if args.bench_lookup:
+        benchmark_product_lookup(
+            load_processed(columns=REPORT_COLUMNS, path=PROCESSED_INPUT), pd.read_csv(RECOMMENDATIONS_INPUT)
+        )
+    else:
+        generate_report(top_n=args.top_n, locales=args.locales, movers=args.movers)
@@ -0,0 +1,310 @@
+import argparse
+import ast
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from profiling import enabled, span
+
+# 项目根目录；流水线切换到这里运行，各阶段的相对路径都相对于它
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+
+# 各阶段交接的文件（与 storage、pricing_model、price_elasticity、main 中的默认路径一致；
+# 这里不导入这些模块，避免无需运行时加载 pandas/sklearn）
+RAW_PATH = 'data/amazon.csv'
+CLEANED_PATH = 'data/cleaned_amazon.parquet'
+PROCESSED_PATH = 'data/processed_amazon.parquet'
+CATEGORY_STATS_PATH = 'data/category_stats.csv'
+MODEL_PATH = 'models/pricing_model.joblib'
+RECOMMENDATIONS_PATH = 'data/price_recommendations.csv'
+ELASTICITY_RESULTS_PATH = 'data/price_elasticity_results.csv'
+REPORT_PATH = 'outputs/pricing_strategy_report.md'
+# 各阶段上次运行的缓存键和输出签名
+STATE_PATH = 'data/pipeline_state.json'
+
+def _run_preprocess(chunksize=None, workers=1):
+    import data_preprocessing
+    data_preprocessing.main(chunksize=chunksize, workers=workers,
+                            input_path=RAW_PATH, output_path=CLEANED_PATH)
+
+def _run_category_stats():
+    from data_preprocessing import get_category_stats
+    from storage import atomic_write, load_processed
+    stats = get_category_stats(load_processed(path=CLEANED_PATH))
+    atomic_write(CATEGORY_STATS_PATH, lambda tmp_path: stats.to_csv(tmp_path))
+    print(f"类别统计已保存到 {CATEGORY_STATS_PATH}")
+
+def _run_sentiment(workers=1, backend='pytorch'):
+    import sentiment_analysis
+    sentiment_analysis.analyze_reviews(workers=workers, backend=backend,
+                                       input_path=CLEANED_PATH, output_path=PROCESSED_PATH)
+
+def _run_pricing(backend='rf'):
+    import pricing_model
+    pricing_model.main(mode='train', model_path=MODEL_PATH, backend=backend,
+                       input_path=PROCESSED_PATH, output_path=RECOMMENDATIONS_PATH)
+
+def _run_elasticity():
+    import price_elasticity
+    price_elasticity.main()
+
+def _run_report():
+    import main
+    main.generate_report()
+
+# 阶段定义：执行函数、输入文件、输出文件、代码所在模块（代码变化时阶段需要重新运行，
+# 这些模块导入的本地模块也计入）
+# 阶段之间的依赖由输入输出文件自动推出
+Stage = namedtuple('Stage', ['func', 'inputs', 'outputs', 'modules'])
+STAGES = {
+    'preprocess': Stage(_run_preprocess, [RAW_PATH], [CLEANED_PATH], ['data_preprocessing.py']),
+    'category_stats': Stage(_run_category_stats, [CLEANED_PATH], [CATEGORY_STATS_PATH],
+                            ['data_preprocessing.py', 'storage.py']),
+    'sentiment': Stage(_run_sentiment, [CLEANED_PATH], [PROCESSED_PATH], ['sentiment_analysis.py']),
+    'pricing': Stage(_run_pricing, [PROCESSED_PATH], [MODEL_PATH, RECOMMENDATIONS_PATH], ['pricing_model.py']),
+    'elasticity': Stage(_run_elasticity, [PROCESSED_PATH], [ELASTICITY_RESULTS_PATH], ['price_elasticity.py']),
+    'report': Stage(_run_report, [PROCESSED_PATH, RECOMMENDATIONS_PATH], [REPORT_PATH], ['main.py']),
+}
+# 只影响执行方式（分块大小、进程数）、不影响输出的参数，不计入缓存键
+EXECUTION_PARAMS = {'chunksize', 'workers'}
+
+def _stage_rows(stage):
+    """阶段处理的行数：第一个 Parquet 输出的行数，没有 Parquet 输出时取第一个 Parquet 输入"""
+    from storage import count_rows
+    parquet_paths = [path for path in stage.outputs + stage.inputs if path.endswith('.parquet')]
+    return count_rows(parquet_paths[0]) if parquet_paths else None
+
+def _run_stage(name, **params):
+    """在子进程中运行一个阶段，开启性能记录时整个阶段计为一个区段，行数由 _stage_rows 给出"""
+    with span(name) as record:
+        STAGES[name].func(**params)
+        if enabled():
+            record['rows'] = _stage_rows(STAGES[name])
+
+def stage_dependencies(stages=STAGES):
+    """由输入输出文件推出每个阶段依赖的上游阶段"""
+    producers = {path: name for name, stage in stages.items() for path in stage.outputs}
+    return {
+        name: sorted({producers[path] for path in stage.inputs if path in producers})
+        for name, stage in stages.items()
+    }
+
+def _file_signature(path):
+    """文件签名（大小, 修改时间）；文件不存在时为None"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+def _local_imports(module):
+    """模块中导入的本地模块（src 下的 .py 文件），包括函数内的延迟导入"""
+    with open(os.path.join(SRC_DIR, module), 'rb') as f:
+        tree = ast.parse(f.read(), filename=module)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            names.add(node.module.split('.')[0])
+    return {f"{name}.py" for name in names if os.path.exists(os.path.join(SRC_DIR, f"{name}.py"))}
+
+def module_closure(modules):
+    """给定模块及其直接或间接导入的全部本地模块，按名称排序"""
+    seen = set()
+    stack = list(modules)
+    while stack:
+        module = stack.pop()
+        if module not in seen:
+            seen.add(module)
+            stack.extend(_local_imports(module) - seen)
+    return sorted(seen)
+
+def _code_digest(modules):
+    digest = hashlib.sha256()
+    for module in module_closure(modules):
+        with open(os.path.join(SRC_DIR, module), 'rb') as f:
+            digest.update(module.encode() + b'\0' + f.read())
+    return digest.hexdigest()
+
+def stage_key(stage, params):
+    """阶段的缓存键：代码、参数和输入文件签名的哈希
+
+    输入文件按（大小, 修改时间）识别，不读取内容，检查开销与数据量无关。
+    EXECUTION_PARAMS 中的参数不改变输出，不计入缓存键。
+    """
+    payload = {
+        'code': _code_digest(stage.modules),
+        'params': {name: value for name, value in params.items() if name not in EXECUTION_PARAMS},
+        'inputs': {path: _file_signature(path) for path in stage.inputs}
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+def _is_up_to_date(stage, key, record):
+    """缓存键一致且输出文件都还是上次运行后的样子"""
+    if not record or record.get('key') != key:
+        return False
+    return all(
+        signature is not None and signature == record.get('outputs', {}).get(path)
+        for path, signature in ((path, _file_signature(path)) for path in stage.outputs)
+    )
+
+def _load_state(path=STATE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _save_state(state, path=STATE_PATH):
+    from storage import atomic_write
+
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+
+    atomic_write(path, write)
+
+def _select_stages(targets, dependencies):
+    """目标阶段及其全部上游阶段，按定义顺序排列"""
+    if not targets:
+        return list(STAGES)
+    selected = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in selected:
+            selected.add(name)
+            stack.extend(dependencies[name])
+    return [name for name in STAGES if name in selected]
+
+def run_pipeline(targets=None, force=(), jobs=None, params=None, dry_run=False):
+    """按依赖顺序运行流水线，跳过输出已是最新的阶段，互不依赖的阶段并行运行
+
+    targets: 要运行的阶段（连同其上游阶段），默认全部
+    force:   无论缓存是否最新都重新运行的阶段
+    jobs:    同时运行的阶段数，默认等于CPU核数
+    params:  {阶段: 参数字典}，传给阶段函数并计入缓存键
+    dry_run: 只显示哪些阶段会运行
+    返回 {阶段: 'cached' | 'ran' | 'failed' | 'skipped' | 'would run'}
+    """
+    os.chdir(ROOT_DIR)
+    params = params or {}
+    dependencies = stage_dependencies()
+    pending = _select_stages(targets, dependencies)
+    state = _load_state()
+    status = {}
+    running = {}
+    start_time = time.perf_counter()
+
+    def ready(name):
+        return all(status.get(dep) in ('cached', 'ran', 'would run') for dep in dependencies[name])
+
+    def upstream_will_run(name):
+        return any(status.get(dep) == 'would run' for dep in dependencies[name])
+
+    def blocked(name):
+        return any(status.get(dep) in ('failed', 'skipped') for dep in dependencies[name])
+
+    executor = None
+    with span('pipeline'):
+        try:
+            while pending or running:
+                # 反复扫描：跳过一个阶段后，下游阶段可能随之就绪
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for name in list(pending):
+                        if blocked(name):
+                            status[name] = 'skipped'
+                        elif ready(name):
+                            stage = STAGES[name]
+                            stage_params = params.get(name, {})
+                            key = stage_key(stage, stage_params)
+                            if (name not in force and not upstream_will_run(name)
+                                    and _is_up_to_date(stage, key, state.get(name))):
+                                status[name] = 'cached'
+                                print(f"[pipeline] {name}: up to date")
+                            elif dry_run:
+                                status[name] = 'would run'
+                                print(f"[pipeline] {name}: would run")
+                            else:
+                                if executor is None:
+                                    # 每个阶段在新进程中运行，内存峰值不包含之前阶段的占用
+                                    executor = ProcessPoolExecutor(
+                                        max_workers=jobs, mp_context=multiprocessing.get_context('spawn'),
+                                        max_tasks_per_child=1
+                                    )
+                                print(f"[pipeline] {name}: running")
+                                before = {path: _file_signature(path) for path in stage.outputs}
+                                future = executor.submit(_run_stage, name, **stage_params)
+                                running[future] = (name, key, before, time.perf_counter())
+                        else:
+                            continue
+                        pending.remove(name)
+                        progressed = True
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, key, before, stage_start = running.pop(future)
+                    stage = STAGES[name]
+                    after = {path: _file_signature(path) for path in stage.outputs}
+                    # 各阶段内部会捕获异常只打印错误，因此以输出文件是否被重新写出判断成败
+                    error = future.exception()
+                    missing = [path for path in stage.outputs if after[path] is None or after[path] == before[path]]
+                    elapsed = time.perf_counter() - stage_start
+                    if error is not None or missing:
+                        status[name] = 'failed'
+                        reason = error if error is not None else f"outputs not written: {', '.join(missing)}"
+                        print(f"[pipeline] {name}: failed after {elapsed:.1f}s ({reason})")
+                        state.pop(name, None)
+                    else:
+                        status[name] = 'ran'
+                        print(f"[pipeline] {name}: done in {elapsed:.1f}s")
+                        state[name] = {'key': key, 'outputs': after}
+                    _save_state(state)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    print(f"\n=== Pipeline finished in {time.perf_counter() - start_time:.2f}s ===")
+    for name, result in status.items():
+        print(f"{name}: {result}")
+    return status
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='运行完整的数据处理和定价流水线')
+    parser.add_argument('stages', nargs='*', default=[],
+                        help=f'要运行的阶段（连同其上游阶段），默认全部。可选: {", ".join(STAGES)}')
+    parser.add_argument('--force', nargs='+', choices=list(STAGES), default=[],
+                        help='无论缓存是否最新都重新运行的阶段')
+    parser.add_argument('--jobs', type=int, default=None, help='同时运行的阶段数（默认CPU核数）')
+    parser.add_argument('--dry-run', action='store_true', help='只显示哪些阶段会运行')
+    parser.add_argument('--preprocess-chunksize', type=int, default=None, help='预处理分块读取的行数')
+    parser.add_argument('--preprocess-workers', type=int, default=1, help='预处理的进程数')
+    parser.add_argument('--sentiment-workers', type=int, default=1, help='情感分析的推理进程数')
+    parser.add_argument('--sentiment-backend', default='pytorch', help='情感分析推理后端')
+    parser.add_argument('--pricing-backend', default='rf', help='定价模型训练后端')
+    args = parser.parse_args()
+    unknown = [name for name in args.stages if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    run_pipeline(
+        targets=args.stages,
+        force=set(args.force),
+        jobs=args.jobs,
+        dry_run=args.dry_run,
+        params={
+            'preprocess': {'chunksize': args.preprocess_chunksize, 'workers': args.preprocess_workers},
+            'sentiment': {'workers': args.sentiment_workers, 'backend': args.sentiment_backend},
+            'pricing': {'backend': args.pricing_backend},
+        }
+    )
@@ -0,0 +1,208 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from profiling import span
+from storage import load_processed
+
+# 估计类别弹性所需的最少样本数，不足时使用全局弹性
+MIN_CATEGORY_SAMPLES = 5
+# 弹性估计所需的最低拟合度R²，低于该值视为无法识别
+MIN_ELASTICITY_R2 = 0.1
+# 价格弹性分析结果
+ELASTICITY_RESULTS_PATH = 'data/price_elasticity_results.csv'
+
+def _log_log_inputs(prices, demand):
+    """取对数并剔除价格或需求不为正的样本，返回 (log价格, log需求, 有效样本掩码)"""
+    prices = np.asarray(prices, dtype=np.float64)
+    demand = np.asarray(demand, dtype=np.float64)
+    valid = (prices > 0) & (demand > 0)
+    log_prices = np.log(prices, where=valid, out=np.zeros_like(prices))
+    log_demand = np.log(demand, where=valid, out=np.zeros_like(demand))
+    return log_prices, log_demand, valid
+
+def _ols_from_sums(n, sx, sy, sxx, syy, sxy):
+    """由分组累加量计算一元线性回归的斜率和R²（可向量化）"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sy / n
+        var_x = sxx - sx * sx / n
+        var_y = syy - sy * sy / n
+        slope = cov / var_x
+        r2 = cov * cov / (var_x * var_y)
+    return slope, r2
+
+def _identified(slope, r2, min_r2):
+    """斜率为负且拟合度足够时才视为可识别的需求弹性"""
+    with np.errstate(invalid='ignore'):
+        return np.isfinite(slope) & (slope < 0) & (r2 >= min_r2)
+
+def estimate_category_elasticity(prices, demand, categories, min_samples=MIN_CATEGORY_SAMPLES,
+                                 min_r2=MIN_ELASTICITY_R2):
+    """按类别估计价格弹性（log需求对log价格回归的斜率）
+
+    所有类别用 bincount 累加后以闭式解一次求出，不逐类别拟合模型。
+    样本不足、价格没有变化、斜率不为负（需求随价格上升，说明斜率反映的是
+    价格以外的因素）或 R² 低于 min_r2 的类别视为无法识别，使用全局弹性；
+    全局弹性同样无法识别时为NaN，按不调价处理。
+    返回以类别为索引的 DataFrame（elasticity, r2_score, sample_size, identified）和全局弹性。
+    """
+    log_prices, log_demand, valid = _log_log_inputs(prices, demand)
+    codes, uniques = pd.factorize(pd.Series(categories).astype(object)[valid].to_numpy())
+    x = log_prices[valid]
+    y = log_demand[valid]
+
+    def sums(weights=None):
+        return np.bincount(codes, weights=weights, minlength=len(uniques))
+
+    n = sums()
+    slope, r2 = _ols_from_sums(n, sums(x), sums(y), sums(x * x), sums(y * y), sums(x * y))
+    global_slope, global_r2 = _ols_from_sums(len(x), x.sum(), y.sum(), (x * x).sum(), (y * y).sum(), (x * y).sum())
+    global_slope = float(global_slope) if _identified(global_slope, global_r2, min_r2) else np.nan
+
+    usable = (n >= min_samples) & _identified(slope, r2, min_r2)
+    result = pd.DataFrame({
+        'elasticity': np.where(usable, slope, global_slope),
+        'r2_score': r2,
+        'sample_size': n.astype(np.int64),
+        'identified': usable
+    }, index=pd.Index(uniques, name='main_category'))
+    return result, global_slope
+
+def optimal_price_change(elasticity, lower=-5.0, upper=5.0):
+    """在 [lower, upper]（%）内求使收入最大的调价幅度
+
+    需求在当前价格 p0 处按弹性 e 线性化：q(p) = q0 * (1 + e * (p/p0 - 1))。
+    收入 p*q(p) 的驻点为 p/p0 = (e-1)/(2e)，e<0 时为最大值，截断到边界内即为最优解。
+    e>=0 或 NaN 表示弹性无法识别，不调价。全部为闭式的数组运算。
+    """
+    elasticity = np.asarray(elasticity, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stationary = ((elasticity - 1) / (2 * elasticity) - 1) * 100
+        change = np.where(elasticity < 0, stationary, 0.0)
+    return np.clip(change, lower, upper)
+
+def demand_ratio(elasticity, change):
+    """调价 change（%）后需求相对当前的比例（线性化需求，不低于0）
+
+    弹性截断到不大于0，需求不会随涨价上升；NaN（无法识别）时需求不变。
+    """
+    elasticity = np.nan_to_num(np.minimum(np.asarray(elasticity, dtype=np.float64), 0), nan=0.0)
+    return np.maximum(1 + elasticity * np.asarray(change) / 100, 0)
+
+class PriceElasticityAnalyzer:
+    def __init__(self):
+        self.elasticity = None
+        self.r2_score = None
+
+    def analyze(self, df):
+        """分析价格弹性"""
+        try:
+            log_prices, log_demand, valid = _log_log_inputs(df['discounted_price'], df['rating_count'])
+            x = log_prices[valid]
+            y = log_demand[valid]
+            e, r2_score = _ols_from_sums(len(x), x.sum(), y.sum(), (x * x).sum(), (y * y).sum(), (x * y).sum())
+            if not np.isfinite(e):
+                raise ValueError('价格没有变化')
+            self.elasticity = float(e)
+            self.r2_score = float(r2_score)
+
+            prices = df['discounted_price'].to_numpy(dtype=np.float64)[valid]
+            demand = df['rating_count'].to_numpy(dtype=np.float64)[valid]
+            return {
+                'elasticity': self.elasticity,
+                'r2_score': self.r2_score,
+                'mean_price': prices.mean(),
+                'mean_demand': demand.mean(),
+                'price_std': prices.std(),
+                'price_range': prices.max() - prices.min(),
+                'price_variance': prices.var(),
+                'demand_variance': demand.var(),
+                'sample_size': len(prices),
+                'analysis': self.interpret_elasticity()
+            }
+        except Exception as e:
+            print(f"Error in elasticity analysis: {str(e)}")
+            return {'elasticity': None, 'analysis': '无法计算价格弹性'}
+
+    def interpret_elasticity(self):
+        """解释价格弹性结果"""
+        if self.elasticity is None:
+            return '尚未计算价格弹性'
+
+        e = abs(self.elasticity)
+        if e < 0.5:
+            return ('需求缺乏弹性：\n'
+                    '- 价格变动对需求影响较小（每1%的价格变动导致{:.2f}%的需求变动）\n'
+                    '- 建议策略：\n'
+                    '  1. 可以考虑适度提高价格以提升利润\n'
+                    '  2. 重点关注产品质量和品牌建设\n'
+                    '  3. 开发产品差异化特征\n'
+                    '  4. 建立品牌忠诚度').format(e)
+        elif e < 1.0:
+            return ('需求弹性适中：\n'
+                    '- 价格变动对需求有一定影响\n'
+                    '- 建议谨慎调整价格\n'
+                    '- 关注竞品定价策略')
+        else:
+            return ('需求富有弹性：\n'
+                    '- 价格变动对需求影响显著\n'
+                    '- 建议保持价格竞争力\n'
+                    '- 可以考虑促销策略')
+
+def main(min_samples=MIN_CATEGORY_SAMPLES):
+    """价格弹性分析：整体弹性和各类别弹性
+
+    取代了原先按 product_id 逐产品拟合的分析：同一产品的多条记录价格几乎相同，
+    逐产品的回归大多无法拟合，而定价策略需要的是类别弹性。
+    结果文件按类别保存（main_category, elasticity, r2_score, sample_size, identified, optimal_change）。
+    """
+    try:
+        print("=== 加载处理后的数据 ===")
+        df = load_processed(columns=['main_category', 'discounted_price', 'rating_count'])
+        print(f"加载了 {len(df)} 条数据记录")
+
+        analyzer = PriceElasticityAnalyzer()
+        overall = analyzer.analyze(df)
+        print("\n=== 整体价格弹性 ===")
+        if overall['elasticity'] is not None:
+            print(f"弹性系数: {overall['elasticity']:.3f}, 拟合度 R²: {overall['r2_score']:.3f}")
+        print(overall['analysis'])
+
+        with span('elasticity.category_fit', rows=len(df)):
+            results, global_elasticity = estimate_category_elasticity(
+                df['discounted_price'], df['rating_count'], df['main_category'], min_samples
+            )
+        results['optimal_change'] = optimal_price_change(results['elasticity'])
+        results = results.sort_values('elasticity')
+
+        print(f"\n=== 各类别价格弹性（{len(results)} 个类别） ===")
+        if np.isnan(global_elasticity):
+            print(f"全局弹性无法识别（斜率不为负或 R² 低于 {MIN_ELASTICITY_R2}），无法识别的类别不调价")
+        else:
+            print(f"全局弹性: {global_elasticity:.3f}")
+        for category, row in results.iterrows():
+            r2 = '-' if np.isnan(row['r2_score']) else f"{row['r2_score']:.3f}"
+            elasticity = '-' if np.isnan(row['elasticity']) else f"{row['elasticity']:.3f}"
+            if row['identified']:
+                source = ''
+            elif np.isnan(row['elasticity']):
+                source = '（无法识别，不调价）'
+            else:
+                source = '（无法识别，使用全局弹性）'
+            print(f"{category}: 弹性 {elasticity}{source}, R² {r2}, "
+                  f"样本 {row['sample_size']:.0f}, 最优调价 {row['optimal_change']:+.1f}%")
+
+        results.to_csv(ELASTICITY_RESULTS_PATH)
+        print(f"\n分析结果已保存到 {ELASTICITY_RESULTS_PATH}")
+
+    except Exception as e:
+        print(f"分析过程中出现错误: {str(e)}")
+        print("请确保数据文件存在且格式正确")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='价格弹性分析')
+    parser.add_argument('--min-samples', type=int, default=MIN_CATEGORY_SAMPLES,
+                        help='估计类别弹性所需的最少样本数')
+    args = parser.parse_args()
+    main(min_samples=args.min_samples)
@@ -1,60 +1,254 @@
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.inspection import permutation_importance
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 
-class PricingModel:
-    def __init__(self):
-        self.model = RandomForestRegressor(
+from price_elasticity import demand_ratio, estimate_category_elasticity, optimal_price_change
+from profiling import peak_rss_mb, span
+from storage import PROCESSED_PATH, atomic_write, iter_processed, load_processed, save_chunks
+
+# 定价模型需要读取的列
+PRICING_COLUMNS = [
+    'product_id', 'main_category', 'discounted_price', 'real_discount',
+    'rating', 'rating_count', 'sentiment_score'
+]
+
+# 训练好的模型文件
+MODEL_PATH = 'models/pricing_model.joblib'
+# 模型文件中的格式标记
+MODEL_FORMAT = 'pricing-model-state-v1'
+# 价格建议输出文件
+RECOMMENDATIONS_PATH = 'data/price_recommendations.csv'
+# 调价情景模拟结果
+SCENARIOS_PATH = 'data/price_scenarios.csv'
+# 价格随机波动的种子（作为 product_id 哈希的键）
+RANDOM_SEED = 42
+# 调价规则的参数及其默认值（与 recommend_prices 一致）
+SCENARIO_PARAMETERS = {
+    'base_weight': 3.0,       # 综合得分的权重
+    'sentiment_weight': 2.0,  # 情感分数的权重
+    'multiplier': 1.0,        # 调整幅度的整体倍数
+    'clip_lower': -5.0,       # 最大降价幅度（%）
+    'clip_upper': 5.0         # 最大提价幅度（%）
+}
+# 模拟结果中价格变动分布的区间边界（%），两端为开区间
+SCENARIO_CHANGE_EDGES = [-5, -3, -1, 1, 3, 5]
+# 决定单个产品价格建议的输入列（增量模式据此计算指纹）
+FINGERPRINT_COLUMNS = [
+    'main_category', 'discounted_price', 'real_discount',
+    'rating', 'rating_count', 'sentiment_score'
+]
+
+# 模型特征（顺序即特征矩阵的列顺序）
+FEATURE_COLUMNS = [
+    'rating_count', 'discount_percentage', 'sentiment_score',
+    'rating', 'price_to_category_avg', 'composite_score'
+]
+
+# 可选的训练后端
+BACKENDS = ['rf', 'rf-parallel', 'hgb']
+
+# 调价策略
+#   heuristic:  综合得分、情感分数加随机波动的固定规则（收入按需求不变估算）
+#   elasticity: 按类别价格弹性求收入最大的价格（收入按弹性调整后的需求估算；弹性无法识别的类别不调价）
+STRATEGIES = ['heuristic', 'elasticity']
+
+def make_estimator(backend='rf'):
+    """创建回归模型
+
+    backend:
+        rf:          单核随机森林（原始配置）
+        rf-parallel: 使用全部CPU核心的随机森林，结果与rf相同
+        hgb:         直方图梯度提升树，大数据量时训练更快
+    """
+    if backend in ('rf', 'rf-parallel'):
+        return RandomForestRegressor(
             n_estimators=100,
+            max_depth=10,
+            random_state=42,
+            n_jobs=-1 if backend == 'rf-parallel' else None
+        )
+    if backend == 'hgb':
+        return HistGradientBoostingRegressor(
             max_depth=10,
             random_state=42
         )
+    raise ValueError(f"Unknown backend: {backend}, expected one of {BACKENDS}")
+
+def random_adjustments(product_ids):
+    """每个产品的随机价格波动（±0.5%），由 product_id 的哈希确定
+
+    同一产品在任何批次、分块或行顺序下得到相同的值，插入或删除其他行不影响它。
+    """
+    hashes = pd.util.hash_pandas_object(
+        pd.Series(product_ids, dtype=object).astype(str), index=False, hash_key=f"{RANDOM_SEED:016d}"
+    ).to_numpy()
+    # 取高53位映射到 [0, 1)
+    return (hashes >> np.uint64(11)) * 2.0 ** -53 - 0.5
+
+def scenario_grid(clip=None, **values):
+    """生成调价参数的网格（笛卡尔积），未指定的参数取默认值
+
+    clip 为对称调价上限的列表，与 clip_lower/clip_upper 二选一。
+    例如 scenario_grid(clip=[3, 5, 10], sentiment_weight=[0, 2, 4]) 生成9个情景。
+    """
+    unknown = set(values) - set(SCENARIO_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown scenario parameters: {sorted(unknown)}")
+    if clip is not None:
+        if 'clip_lower' in values or 'clip_upper' in values:
+            raise ValueError("clip cannot be combined with clip_lower/clip_upper")
+        bounds = np.abs(np.atleast_1d(clip).astype(np.float64))
+        values = dict(values, clip_lower=-bounds, clip_upper=bounds)
+
+    axes = {name: np.atleast_1d(values.get(name, default)) for name, default in SCENARIO_PARAMETERS.items()}
+    paired = clip is not None
+    if paired:
+        # 对称上下限成对出现，不做交叉组合
+        axes['clip_lower'] = list(zip(axes.pop('clip_lower'), axes.pop('clip_upper')))
+    rows = itertools.product(*axes.values())
+    if paired:
+        rows = (row[:-1] + row[-1] for row in rows)
+    return pd.DataFrame(list(rows), columns=list(SCENARIO_PARAMETERS), dtype=np.float64)
+
+class PricingModel:
+    def __init__(self, backend='rf'):
+        self.backend = backend
+        self.model = make_estimator(backend)
         self.scaler = StandardScaler()
         
-    def prepare_features(self, df):
-        """准备模型特征"""
-        features = pd.DataFrame()
-        
-        # 基础特征
-        features['rating_count'] = np.log1p(df['rating_count'])  # 评论数（作为销量代理）
-        
-        # 清理折扣率数据（移除%符号并转换为浮点数）
-        features['discount_percentage'] = df['discount_percentage'].str.rstrip('%').astype(float) / 100
-        
-        features['sentiment_score'] = df['sentiment_score']  # 评论情感得分
-        features['rating'] = df['rating']  # 评分
-        
-        # 计算每个类别的平均价格
-        category_avg_price = df.groupby('main_category')['discounted_price'].transform('mean')
-        features['price_to_category_avg'] = df['discounted_price'] / category_avg_price
-        
-        # 计算综合得分
-        features['composite_score'] = (
-            0.4 * np.log1p(df['rating_count']) / np.log1p(df['rating_count'].max()) +  # 销量权重
-            0.3 * df['rating'] / 5.0 +  # 评分权重
-            0.3 * df['sentiment_score']  # 情感权重
+    def fit_features(self, df):
+        """在训练数据上冻结特征统计量：类别均价、归一化常数和标准化参数"""
+        prices = df['discounted_price'].astype(np.float64)
+        self.category_avg_price_ = prices.groupby(
+            df['main_category'].astype(object), sort=False
+        ).mean().to_dict()
+        self.global_avg_price_ = prices.mean()  # 训练时未出现的类别使用全局均价
+        self.log_rating_count_max_ = np.log1p(float(df['rating_count'].max()))
+        self.rating_count_q90_ = float(df['rating_count'].quantile(0.9))
+        elasticity, self.global_elasticity_ = estimate_category_elasticity(
+            df['discounted_price'], df['rating_count'], df['main_category']
         )
-        
-        # 标准化特征
-        features = pd.DataFrame(
-            self.scaler.fit_transform(features),
-            columns=features.columns,
-            index=features.index
+        self.category_elasticity_ = elasticity['elasticity'].to_dict()
+
+        self.scaler.fit(self._raw_features(df))
+        return self
+
+    def _category_lookup(self, categories, lookup, default):
+        """按类别查找训练时的统计量，未出现的类别使用 default"""
+        if isinstance(categories.dtype, pd.CategoricalDtype):
+            # 分类列只需查找每个类别一次，再按编码取值（编码-1表示缺失）
+            table = np.array(
+                [lookup.get(c, default) for c in categories.cat.categories]
+                + [default]
+            )
+            return table[categories.cat.codes.to_numpy()]
+        return np.fromiter(
+            (lookup.get(c, default) for c in categories.to_numpy(dtype=object)),
+            dtype=np.float64,
+            count=len(categories)
         )
-        
-        return features
+
+    def _category_avg_price(self, categories):
+        """查找训练时的类别均价，未出现的类别使用全局均价"""
+        return self._category_lookup(categories, self.category_avg_price_, self.global_avg_price_)
+
+    def _category_elasticity(self, categories):
+        """查找训练时估计的类别价格弹性，未出现的类别使用全局弹性"""
+        if not hasattr(self, 'category_elasticity_'):
+            raise ValueError("模型中没有价格弹性估计，请重新训练模型")
+        return self._category_lookup(categories, self.category_elasticity_, self.global_elasticity_)
+
+    def _raw_features(self, df):
+        """计算标准化前的特征矩阵"""
+        rating_count = df['rating_count'].to_numpy(dtype=np.float64)
+        rating = df['rating'].to_numpy(dtype=np.float64)
+        sentiment = df['sentiment_score'].to_numpy(dtype=np.float64)
+        price = df['discounted_price'].to_numpy(dtype=np.float64)
+        log_rating_count = np.log1p(rating_count)  # 评论数（作为销量代理）
+
+        category_avg_price = self._category_avg_price(df['main_category'])
+
+        return np.column_stack([
+            log_rating_count,
+            df['real_discount'].to_numpy(dtype=np.float64) / 100,  # 折扣率（预处理阶段已解析为数值）
+            sentiment,  # 评论情感得分
+            rating,  # 评分
+            price / category_avg_price,
+            # 综合得分
+            0.4 * log_rating_count / self.log_rating_count_max_ +  # 销量权重
+            0.3 * rating / 5.0 +  # 评分权重
+            0.3 * sentiment  # 情感权重
+        ])
+
+    def transform_features(self, df):
+        """使用训练时冻结的统计量转换特征，结果与批次大小无关"""
+        scaled = (self._raw_features(df) - self.scaler.mean_) / self.scaler.scale_
+        return pd.DataFrame(scaled, columns=FEATURE_COLUMNS, index=df.index)
+
+    def prepare_features(self, df, fit=False):
+        """准备模型特征；fit=True 时先在 df 上拟合特征统计量"""
+        if fit:
+            self.fit_features(df)
+        return self.transform_features(df)
     
+    def save(self, path=MODEL_PATH):
+        """保存训练好的模型和冻结的特征统计量
+
+        保存的是属性字典而不是实例本身，因此文件与训练时的模块名无关：
+        以脚本运行训练的模型可以被导入方加载，反之亦然。
+        """
+        state = dict(vars(self), format=MODEL_FORMAT)
+        # 不压缩保存，加载时才能内存映射
+        atomic_write(path, lambda tmp_path: joblib.dump(state, tmp_path))
+        print(f"Model saved to {path}")
+
+    @classmethod
+    def load(cls, path=MODEL_PATH, mmap_mode='r'):
+        """加载已训练的模型
+
+        mmap_mode 只对以numpy数组保存的大数组生效（如hgb的树节点数组）；
+        随机森林的树在反序列化时会复制节点数组，不会被内存映射。
+        """
+        state = joblib.load(path, mmap_mode=mmap_mode)
+        if not isinstance(state, dict) or state.get('format') != MODEL_FORMAT:
+            raise TypeError(f"{path} 不是 {cls.__name__} 模型文件")
+        model = cls.__new__(cls)
+        model.__dict__.update({key: value for key, value in state.items() if key != 'format'})
+        return model
+
+    def fit(self, df):
+        """拟合特征统计量和回归模型，返回训练特征"""
+        with span('pricing.features', rows=len(df)):
+            features = self.prepare_features(df, fit=True)
+        with span('pricing.fit', rows=len(df)):
+            self.model.fit(features, df['discounted_price'])
+        return features
+
     def train(self, df):
         """训练定价模型"""
-        print("\n=== Training Pricing Model ===")
-        features = self.prepare_features(df)
-        current_prices = df['discounted_price']
-        
-        # 训练模型
-        self.model.fit(features, current_prices)
-        
-        # 计算特征重要性
+        print(f"\n=== Training Pricing Model ({self.backend}) ===")
+        features = self.fit(df)
+        
+        # 计算特征重要性。梯度提升树没有内置重要性，置换重要性需要另外拟合一个模型并在
+        # 留出数据上计算，代价与训练相当，因此不在训练时计算，由 compare-backends 给出
+        if not hasattr(self.model, 'feature_importances_'):
+            print("\nFeature importance is not built into this backend; "
+                  "run compare-backends for holdout permutation importance")
+            return None
         importance = pd.DataFrame({
             'feature': features.columns,
             'importance': self.model.feature_importances_
@@ -66,32 +260,127 @@ class PricingModel:
         
         return importance
     
-    def recommend_prices(self, df):
-        """生成价格建议"""
-        print("\n=== Generating Price Recommendations ===")
-        features = self.prepare_features(df)
-        predicted_prices = self.model.predict(features)
+    def recommend_prices(self, df, verbose=True, strategy='heuristic'):
+        """生成价格建议
+
+        全部为向量化的数组运算；verbose=False 时不输出任何统计信息，
+        控制台报告由 report_recommendations 单独生成。strategy 见 STRATEGIES。
+        """
+        if verbose:
+            print("\n=== Generating Price Recommendations ===")
+        recommendations = self._recommend_chunk(df, random_adjustments(df['product_id']), strategy)
+        
+        if verbose:
+            report_recommendations(recommendations)
+        
+        return recommendations
+
+    def recommend_prices_stream(self, chunks, summary=None, strategy='heuristic'):
+        """逐块生成价格建议
+
+        chunks 为数据块的迭代器，每个数据块产出一个建议块。特征只使用训练时
+        冻结的统计量，随机波动只与 product_id 有关，因此结果与一次性
+        调用 recommend_prices 相同，内存占用只与块大小有关。
+        summary 为 RecommendationSummary 时同时累计统计信息。
+        """
+        for chunk in chunks:
+            recommendations = self._recommend_chunk(chunk, random_adjustments(chunk['product_id']), strategy)
+            if summary is not None:
+                summary.update(recommendations)
+            yield recommendations
+
+    def simulate_scenarios(self, df, scenarios, max_cells=2 ** 24):
+        """在一组调价参数上模拟收入影响，不重新运行回归模型
+
+        scenarios 为每行一组参数的 DataFrame（列见 SCENARIO_PARAMETERS，缺失的列取默认值），
+        可由 scenario_grid 生成。所有情景在 (情景数 × 产品数) 的数组上一次广播计算，
+        按 max_cells 个元素分块以限制内存。返回每个情景的参数、总收入变化和价格变动分布。
+        """
+        features = self.transform_features(df)
+        composite_score = features['composite_score'].to_numpy()
+        sentiment = df['sentiment_score'].to_numpy(dtype=np.float64)
+        random_adjustment = random_adjustments(df['product_id'])
+        price = df['discounted_price'].to_numpy(dtype=np.float64)
+        current_revenue_per_product = price * df['rating_count'].to_numpy(dtype=np.float64)
+        current_revenue = current_revenue_per_product.sum()
+
+        params = {
+            name: scenarios[name].to_numpy(dtype=np.float64)[:, None] if name in scenarios
+            else np.full((len(scenarios), 1), default)
+            for name, default in SCENARIO_PARAMETERS.items()
+        }
+        edges = np.array(SCENARIO_CHANGE_EDGES, dtype=np.float64)
+        n_bins = len(edges) + 1
+        step = max(1, max_cells // max(len(df), 1))
+
+        revenue_delta = np.empty(len(scenarios))
+        mean_change = np.empty(len(scenarios))
+        increases = np.empty(len(scenarios), dtype=np.int64)
+        decreases = np.empty(len(scenarios), dtype=np.int64)
+        distribution = np.empty((len(scenarios), n_bins), dtype=np.int64)
+        for start in range(0, len(scenarios), step):
+            block = slice(start, start + step)
+            # (情景数 × 产品数) 的调价幅度
+            change = params['multiplier'][block] * (
+                composite_score * params['base_weight'][block]
+                + (sentiment - 0.5) * params['sentiment_weight'][block]
+                + random_adjustment
+            )
+            np.clip(change, params['clip_lower'][block], params['clip_upper'][block], out=change)
+
+            # 收入变化 = Σ 价格 × 评论数 × 调价幅度 / 100
+            revenue_delta[block] = change @ current_revenue_per_product / 100
+            mean_change[block] = change.mean(axis=1)
+            increases[block] = (change > 0).sum(axis=1)
+            decreases[block] = (change < 0).sum(axis=1)
+            # 每行的区间编号加上行偏移后统一计数
+            bins = np.digitize(change, edges) + np.arange(change.shape[0])[:, None] * n_bins
+            distribution[block] = np.bincount(bins.ravel(), minlength=change.shape[0] * n_bins).reshape(-1, n_bins)
+
+        result = pd.DataFrame({name: values[:, 0] for name, values in params.items()})
+        result['current_revenue'] = current_revenue
+        result['expected_revenue'] = current_revenue + revenue_delta
+        result['revenue_change_pct'] = revenue_delta / current_revenue * 100
+        result['mean_change'] = mean_change
+        result['increase_count'] = increases
+        result['decrease_count'] = decreases
+        labels = ([f'change_lt_{edges[0]:g}']
+                  + [f'change_{lower:g}_{upper:g}' for lower, upper in zip(edges[:-1], edges[1:])]
+                  + [f'change_ge_{edges[-1]:g}'])
+        for i, label in enumerate(labels):
+            result[label] = distribution[:, i]
+        return result
+
+    def _recommend_chunk(self, df, random_adjustment, strategy='heuristic'):
+        """为一个数据块生成价格建议，random_adjustment 为每行的随机波动（仅heuristic策略使用）"""
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy}, expected one of {STRATEGIES}")
+        with span('pricing.features', rows=len(df)):
+            features = self.prepare_features(df)
+        with span('pricing.predict', rows=len(df)):
+            predicted_prices = self.model.predict(features)
         
         # 创建建议数据框
         recommendations = pd.DataFrame()
         recommendations['product_id'] = df['product_id']
-        recommendations['current_price'] = df['discounted_price']
+        recommendations['current_price'] = df['discounted_price'].astype(np.float64)
         recommendations['predicted_price'] = predicted_prices
         
-        # 基于综合得分和情感分数调整价格
-        # 降低基础调整幅度
-        base_adjustment = (features['composite_score'] * 3)  # 从5降到3
-        sentiment_adjustment = (df['sentiment_score'] - 0.5) * 2  # 从3降到2
-        
-        # 添加随机波动（±0.5%）
-        np.random.seed(42)
-        random_adjustment = np.random.uniform(-0.5, 0.5, len(recommendations))
-        
-        # 计算最终调整幅度
-        recommendations['adjusted_change'] = (base_adjustment + sentiment_adjustment + random_adjustment)
-        
-        # 更保守的价格变动范围
-        recommendations['adjusted_change'] = recommendations['adjusted_change'].clip(-5, 5)  # 最大变动±5%
+        if strategy == 'elasticity':
+            # 在±5%内求使收入最大的调价幅度（按类别弹性，闭式解）
+            elasticity = self._category_elasticity(df['main_category'])
+            recommendations['adjusted_change'] = optimal_price_change(elasticity, -5, 5)
+        else:
+            # 基于综合得分和情感分数调整价格
+            # 降低基础调整幅度
+            base_adjustment = (features['composite_score'] * 3)  # 从5降到3
+            sentiment_adjustment = (df['sentiment_score'] - 0.5) * 2  # 从3降到2
+            
+            # 计算最终调整幅度（含±0.5%的随机波动）
+            recommendations['adjusted_change'] = (base_adjustment + sentiment_adjustment + random_adjustment)
+            
+            # 更保守的价格变动范围
+            recommendations['adjusted_change'] = recommendations['adjusted_change'].clip(-5, 5)  # 最大变动±5%
         
         # 计算建议价格
         recommendations['recommended_price'] = recommendations['current_price'] * (
@@ -99,70 +388,28 @@ class PricingModel:
         )
         
         # 添加置信度分数
-        recommendations['confidence'] = self._calculate_confidence(df, features)
+        with span('pricing.confidence', rows=len(df)):
+            recommendations['confidence'] = self._calculate_confidence(df, features)
         
         # 生成建议
-        recommendations['recommendation'] = recommendations.apply(
-            self._get_recommendation, axis=1
+        recommendations['recommendation'] = self._get_recommendations(
+            recommendations['adjusted_change'].to_numpy(),
+            recommendations['confidence'].to_numpy()
         )
         
-        # 计算统计信息
-        total = len(recommendations)
-        increase_mask = recommendations['adjusted_change'] > 0
-        decrease_mask = recommendations['adjusted_change'] < 0
-        no_change_mask = abs(recommendations['adjusted_change']) < 3
-        
-        increase_count = sum(increase_mask)
-        decrease_count = sum(decrease_mask)
-        no_change_count = sum(no_change_mask)
-        
-        # 计算收入变化
-        current_revenue = (recommendations['current_price'] * df['rating_count']).sum()
-        expected_revenue = (recommendations['recommended_price'] * df['rating_count']).sum()
-        revenue_change = ((expected_revenue - current_revenue) / current_revenue * 100)
-        
-        # 计算每个产品的收入变化
-        recommendations['current_revenue'] = recommendations['current_price'] * df['rating_count']
-        recommendations['expected_revenue'] = recommendations['recommended_price'] * df['rating_count']
+        # 计算每个产品的收入变化（中间数据为float32，收入按float64累加）
+        rating_count = df['rating_count'].astype(np.float64)
+        recommendations['current_revenue'] = recommendations['current_price'] * rating_count
+        recommendations['expected_revenue'] = recommendations['recommended_price'] * rating_count
+        if strategy == 'elasticity':
+            # 需求随价格按弹性变化
+            recommendations['expected_revenue'] *= demand_ratio(elasticity, recommendations['adjusted_change'])
         recommendations['revenue_change_pct'] = (
             (recommendations['expected_revenue'] - recommendations['current_revenue']) 
             / recommendations['current_revenue'] * 100
         )
-        
-        # 输出更详细的统计信息
-        print("\n=== Price Adjustment Statistics ===")
-        print(f"Total products analyzed: {total}")
-        
-        # 更细致的价格变动区间统计
-        change_ranges = {
-            '降价(3-5%)': (-5, -3),
-            '小幅降价(1-3%)': (-3, -1),
-            '基本维持(±1%)': (-1, 1),
-            '小幅提价(1-3%)': (1, 3),
-            '提价(3-5%)': (3, 5)
-        }
-        
-        print("\nPrice Change Distribution:")
-        for name, (lower, upper) in change_ranges.items():
-            count = sum((recommendations['adjusted_change'] >= lower) & 
-                       (recommendations['adjusted_change'] < upper))
-            print(f"{name}: {count} products ({count/total*100:.1f}%)")
-        
-        print(f"\nRevenue Impact:")
-        print(f"Current total revenue: ₹{current_revenue:,.2f}")
-        print(f"Expected total revenue: ₹{expected_revenue:,.2f}")
-        print(f"Expected revenue change: {revenue_change:.1f}%")
-        
-        # 按调价幅度排序显示top变动
-        print("\nTop Price Increases:")
-        top_increases = recommendations.nlargest(5, 'adjusted_change')
-        for _, row in top_increases.iterrows():
-            print(f"Product {row['product_id']}: +{row['adjusted_change']:.1f}% (₹{row['current_price']:.2f} → ₹{row['recommended_price']:.2f})")
-        
-        print("\nTop Price Decreases:")
-        top_decreases = recommendations.nsmallest(5, 'adjusted_change')
-        for _, row in top_decreases.iterrows():
-            print(f"Product {row['product_id']}: {row['adjusted_change']:.1f}% (₹{row['current_price']:.2f} → ₹{row['recommended_price']:.2f})")
+        if strategy == 'elasticity':
+            recommendations['elasticity'] = elasticity
         
         return recommendations
     
@@ -171,7 +418,7 @@ class PricingModel:
         confidence = pd.Series(index=df.index)
         
         # 基于评论数的置信度
-        review_confidence = np.clip(df['rating_count'] / df['rating_count'].quantile(0.9), 0, 1)
+        review_confidence = np.clip(df['rating_count'] / self.rating_count_q90_, 0, 1)
         
         # 基于情感分数的置信度（越极端越确信）
         sentiment_confidence = abs(df['sentiment_score'] - 0.5) * 2
@@ -189,34 +436,353 @@ class PricingModel:
         
         return confidence
     
-    def _get_recommendation(self, row):
-        """生成具体的价格调整建议"""
-        change = row['adjusted_change']
-        confidence = row['confidence']
-        
-        if confidence < 0.3:
-            return "数据不足，建议观察"
-        
-        if abs(change) < 3:
-            return "价格合理，保持现状"
-        elif change > 0:
-            return f"建议提价 {change:.1f}%"
+    def _get_recommendations(self, change, confidence):
+        """生成具体的价格调整建议（按数组整体计算）"""
+        labels = np.select(
+            [confidence < 0.3, np.abs(change) < 3, change > 0],
+            ["数据不足，建议观察", "价格合理，保持现状", "建议提价 "],
+            default="建议降价 "
+        ).astype(object)
+        # 只对需要调价的产品格式化幅度
+        adjust = (labels == "建议提价 ") | (labels == "建议降价 ")
+        labels[adjust] += np.char.mod('%.1f%%', np.abs(change[adjust])).astype(object)
+        return labels
+
+# 价格变动区间，左闭右开
+CHANGE_RANGES = {
+    '降价(3-5%)': (-5, -3),
+    '小幅降价(1-3%)': (-3, -1),
+    '基本维持(±1%)': (-1, 1),
+    '小幅提价(1-3%)': (1, 3),
+    '提价(3-5%)': (3, 5)
+}
+
+def change_distribution(adjusted_change):
+    """统计各价格变动区间的产品数"""
+    bounds = list(CHANGE_RANGES.values())
+    edges = np.array([lower for lower, _ in bounds] + [bounds[-1][1]])
+    # digitize 返回 i 满足 edges[i-1] <= x < edges[i]，区间外的落在 0 和 len(edges)
+    counts = np.bincount(np.digitize(adjusted_change, edges), minlength=len(edges) + 1)
+    return dict(zip(CHANGE_RANGES, counts[1:len(edges)].tolist()))
+
+class RecommendationSummary:
+    """逐块累计价格建议的统计信息，内存占用与产品数无关"""
+
+    TOP_COLUMNS = ['product_id', 'adjusted_change', 'current_price', 'recommended_price']
+
+    def __init__(self, top_n=5):
+        self.top_n = top_n
+        self.total = 0
+        self.distribution = dict.fromkeys(CHANGE_RANGES, 0)
+        self.current_revenue = 0.0
+        self.expected_revenue = 0.0
+        self.top_increases = pd.DataFrame(columns=self.TOP_COLUMNS)
+        self.top_decreases = pd.DataFrame(columns=self.TOP_COLUMNS)
+
+    def update(self, recommendations):
+        """累计一个建议块"""
+        self.total += len(recommendations)
+        for name, count in change_distribution(recommendations['adjusted_change'].to_numpy()).items():
+            self.distribution[name] += count
+        self.current_revenue += recommendations['current_revenue'].sum()
+        self.expected_revenue += recommendations['expected_revenue'].sum()
+
+        # 只保留当前的前N名；先出现的行排在前面，并列时与整体排序一致
+        top = recommendations[self.TOP_COLUMNS]
+        self.top_increases = self._merge_top(self.top_increases, top.nlargest(self.top_n, 'adjusted_change'), 'nlargest')
+        self.top_decreases = self._merge_top(self.top_decreases, top.nsmallest(self.top_n, 'adjusted_change'), 'nsmallest')
+        return self
+
+    def _merge_top(self, current, new, method):
+        if current.empty:
+            return new.reset_index(drop=True)
+        merged = pd.concat([current, new], ignore_index=True)
+        return getattr(merged, method)(self.top_n, 'adjusted_change').reset_index(drop=True)
+
+    def report(self):
+        """在控制台输出统计信息"""
+        total = self.total
+        revenue_change = ((self.expected_revenue - self.current_revenue) / self.current_revenue * 100)
+        
+        # 输出更详细的统计信息
+        print("\n=== Price Adjustment Statistics ===")
+        print(f"Total products analyzed: {total}")
+        
+        print("\nPrice Change Distribution:")
+        for name, count in self.distribution.items():
+            print(f"{name}: {count} products ({count/total*100:.1f}%)")
+        
+        print(f"\nRevenue Impact:")
+        print(f"Current total revenue: ₹{self.current_revenue:,.2f}")
+        print(f"Expected total revenue: ₹{self.expected_revenue:,.2f}")
+        print(f"Expected revenue change: {revenue_change:.1f}%")
+        
+        # 按调价幅度排序显示top变动
+        print("\nTop Price Increases:")
+        for product_id, change, current, recommended in self.top_increases.itertuples(index=False):
+            print(f"Product {product_id}: +{change:.1f}% (₹{current:.2f} → ₹{recommended:.2f})")
+        
+        print("\nTop Price Decreases:")
+        for product_id, change, current, recommended in self.top_decreases.itertuples(index=False):
+            print(f"Product {product_id}: {change:.1f}% (₹{current:.2f} → ₹{recommended:.2f})")
+
+def report_recommendations(recommendations, top_n=5):
+    """在控制台输出价格建议的统计信息"""
+    RecommendationSummary(top_n).update(recommendations).report()
+
+def file_digest(path):
+    """计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def _incremental_state_paths(output_path):
+    """增量模式的状态文件：每行指纹（Parquet）和汇总信息（JSON）"""
+    base = os.path.splitext(output_path)[0]
+    return f"{base}.fingerprints.parquet", f"{base}.summary.json"
+
+def fingerprint_rows(df, random_adjustment):
+    """计算每行价格建议输入的指纹（特征输入列加上该行的随机波动）"""
+    inputs = df[FINGERPRINT_COLUMNS].copy()
+    inputs['random_adjustment'] = random_adjustment
+    return pd.util.hash_pandas_object(inputs, index=False).to_numpy()
+
+def _load_incremental_state(output_path, model_key):
+    """读取上次运行的建议、指纹和汇总信息；任何一项缺失或不一致时返回None"""
+    state_path, summary_path = _incremental_state_paths(output_path)
+    try:
+        with open(summary_path) as f:
+            summary = json.load(f)
+        if (summary['model'] != model_key
+                or summary['output'] != _file_signature(output_path)
+                or summary['fingerprints'] != _file_signature(state_path)):
+            return None
+        if output_path.endswith('.parquet'):
+            previous = pd.read_parquet(output_path)
         else:
-            return f"建议降价 {abs(change):.1f}%"
+            # 按原值精确解析浮点数，沿用的行与全量计算完全一致
+            previous = pd.read_csv(output_path, float_precision='round_trip')
+        state = pd.read_parquet(state_path)
+    except (OSError, KeyError, ValueError):
+        return None
+    if len(previous) != len(state) or not (previous['product_id'].to_numpy() == state['product_id'].to_numpy()).all():
+        return None
+    return previous, state, summary
 
-def main():
-    """测试定价模型"""
+def recommend_prices_incremental(model, df, model_key, output_path=RECOMMENDATIONS_PATH, strategy='heuristic'):
+    """增量生成价格建议，只重新计算输入发生变化的产品
+
+    产品按 (product_id, 出现次数) 对齐上次的结果；指纹相同的行直接沿用上次的建议，
+    其余行重新计算。总收入在上次的基础上减去被替换和删除的旧行、加上新计算的行。
+    模型或上次的输出文件变化时退化为全量计算。结果写回 output_path，
+    返回 (价格建议, 汇总信息, 重新计算的行数)。
+    """
+    model_key = f"{model_key}:{strategy}"
+    random_adjustment = random_adjustments(df['product_id'])
+    product_ids = df['product_id'].to_numpy()
+    occurrence = df.groupby('product_id', sort=False).cumcount().to_numpy()
+    fingerprints = fingerprint_rows(df, random_adjustment)
+
+    loaded = _load_incremental_state(output_path, model_key)
+    if loaded is None:
+        recommendations = model._recommend_chunk(df, random_adjustment, strategy)
+        recommendations.index = pd.RangeIndex(len(df))
+        rescored_count = len(df)
+        current_revenue = recommendations['current_revenue'].sum()
+        expected_revenue = recommendations['expected_revenue'].sum()
+    else:
+        previous, state, summary = loaded
+        previous_keys = pd.MultiIndex.from_arrays([state['product_id'], state['occurrence']])
+        positions = previous_keys.get_indexer(pd.MultiIndex.from_arrays([product_ids, occurrence]))
+        unchanged = positions >= 0
+        unchanged[unchanged] = state['fingerprint'].to_numpy()[positions[unchanged]] == fingerprints[unchanged]
+        rescored_rows = np.flatnonzero(~unchanged)
+
+        if len(rescored_rows):
+            rescored = model._recommend_chunk(df.iloc[rescored_rows], random_adjustment[rescored_rows], strategy)
+        else:
+            rescored = previous.iloc[:0]
+        kept = previous.iloc[positions[unchanged]]
+        recommendations = pd.concat([
+            kept.set_axis(np.flatnonzero(unchanged)),
+            rescored.set_axis(rescored_rows)
+        ]).sort_index()
+        rescored_count = len(rescored_rows)
+
+        # 上次结果中被替换或已删除的行
+        stale = np.ones(len(previous), dtype=bool)
+        stale[positions[unchanged]] = False
+        current_revenue = (summary['current_revenue'] - previous['current_revenue'].to_numpy()[stale].sum()
+                           + rescored['current_revenue'].sum())
+        expected_revenue = (summary['expected_revenue'] - previous['expected_revenue'].to_numpy()[stale].sum()
+                            + rescored['expected_revenue'].sum())
+
+    # 依次写出建议、指纹，最后写汇总信息（记录前两者的文件签名，保证三者一致）
+    state_path, summary_path = _incremental_state_paths(output_path)
+    save_chunks([recommendations], output_path)
+    state = pd.DataFrame({'product_id': product_ids, 'occurrence': occurrence, 'fingerprint': fingerprints})
+    atomic_write(state_path, lambda tmp_path: state.to_parquet(tmp_path, index=False))
+    summary = {
+        'model': model_key,
+        'products': len(recommendations),
+        'current_revenue': float(current_revenue),
+        'expected_revenue': float(expected_revenue),
+        'output': _file_signature(output_path),
+        'fingerprints': _file_signature(state_path)
+    }
+
+    def write_summary(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    atomic_write(summary_path, write_summary)
+    return recommendations, summary, rescored_count
+
+def _fit_backend(backend, train_df, holdout_df):
+    """在独立子进程中训练一个后端，返回耗时、内存峰值、验证集预测和验证集上的置换重要性"""
+    model = PricingModel(backend)
+    rss_before = peak_rss_mb()
+    start_time = time.perf_counter()
+    model.fit(train_df)
+    train_time = time.perf_counter() - start_time
+    rss_after = peak_rss_mb()
+    holdout_features = model.transform_features(holdout_df)
+    predicted = model.model.predict(holdout_features)
+    # 各后端统一在留出数据上计算置换重要性，不计入训练耗时
+    importance = pd.Series(permutation_importance(
+        model.model, holdout_features, holdout_df['discounted_price'], n_repeats=5, random_state=42
+    ).importances_mean, index=holdout_features.columns)
+    return train_time, rss_after, rss_after - rss_before, predicted, importance
+
+def compare_backends(df, backends=BACKENDS, test_size=0.2):
+    """在同一训练/验证划分上比较各训练后端的耗时、内存峰值和验证误差
+
+    每个后端在单独的子进程中训练，内存峰值互不影响。
+    同时打印各后端在验证集上的置换重要性（训练时不计算）。
+    """
+    train_df, holdout_df = train_test_split(df, test_size=test_size, random_state=42)
+    actual = holdout_df['discounted_price'].to_numpy(dtype=np.float64)
+
+    rows = []
+    importances = {}
+    for backend in backends:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            train_time, peak_rss, train_rss, predicted, importances[backend] = executor.submit(
+                _fit_backend, backend, train_df, holdout_df
+            ).result()
+
+        rows.append({
+            'backend': backend,
+            'train_seconds': train_time,
+            'peak_rss_mb': peak_rss,
+            'train_rss_mb': train_rss,
+            'holdout_mae': mean_absolute_error(actual, predicted),
+            'holdout_rmse': np.sqrt(mean_squared_error(actual, predicted)),
+            'holdout_r2': r2_score(actual, predicted)
+        })
+
+    comparison = pd.DataFrame(rows)
+    print(f"\n=== Training Backend Comparison ({len(train_df)} train / {len(holdout_df)} holdout) ===")
+    for _, row in comparison.iterrows():
+        print(f"{row['backend']:>12}: train {row['train_seconds']:6.2f}s, "
+              f"peak RSS {row['peak_rss_mb']:7.1f} MB (+{row['train_rss_mb']:.1f} MB during fit), "
+              f"MAE ₹{row['holdout_mae']:,.2f}, RMSE ₹{row['holdout_rmse']:,.2f}, R² {row['holdout_r2']:.3f}")
+
+    print("\nHoldout Permutation Importance:")
+    importance = pd.DataFrame(importances)
+    for feature, row in importance.sort_values(backends[0], ascending=False).iterrows():
+        print(f"- {feature}: " + ", ".join(f"{backend} {row[backend]:.3f}" for backend in backends))
+    return comparison
+
+def main(mode='train', model_path=MODEL_PATH, backend='rf', chunksize=None, output_path=RECOMMENDATIONS_PATH,
+         incremental=False, grid=None, strategy='heuristic', input_path=PROCESSED_PATH):
+    """测试定价模型
+
+    mode:
+        train:          训练模型、生成价格建议并保存模型
+        recommend-only: 加载已保存的模型直接生成价格建议，不重新训练
+        compare-backends: 比较各训练后端，不生成建议
+        simulate:       加载已保存的模型，在 grid 给出的参数网格上模拟收入影响
+    chunksize: 指定时按块读取数据并流式写出价格建议（CSV或Parquet，按扩展名）
+    incremental: 只重新计算输入变化的产品，并合并到上次的价格建议中（仅用于 recommend-only，
+                 重新训练会改变模型，所有产品都需要重新计算）
+    strategy: 调价策略，见 STRATEGIES
+    input_path: 处理后的数据文件，训练和生成建议都从这里读取
+    """
     try:
-        # 加载数据
-        print("=== Loading Data ===")
-        df = pd.read_csv('data/processed_amazon.csv')
-        
-        # 创建并训练模型
-        model = PricingModel()
-        importance = model.train(df)
+        start_time = time.perf_counter()
+
+        # 加载数据（流式生成建议且不训练时无需整体加载）
+        if mode != 'recommend-only' or not chunksize:
+            print("=== Loading Data ===")
+            df = load_processed(columns=PRICING_COLUMNS, path=input_path)
+        
+        if mode == 'compare-backends':
+            compare_backends(df)
+            return
+        
+        if mode == 'simulate':
+            model = PricingModel.load(model_path)
+            scenarios = scenario_grid(**(grid or {}))
+            print(f"\n=== Simulating {len(scenarios)} Pricing Scenarios ===")
+            with span('pricing.simulate', rows=len(df) * len(scenarios)):
+                results = model.simulate_scenarios(df, scenarios)
+            save_chunks([results], SCENARIOS_PATH)
+            print("\nTop scenarios by expected revenue change:")
+            for _, row in results.nlargest(10, 'revenue_change_pct').iterrows():
+                print(f"base {row['base_weight']:g}, sentiment {row['sentiment_weight']:g}, "
+                      f"x{row['multiplier']:g}, clip [{row['clip_lower']:g}%, {row['clip_upper']:g}%]: "
+                      f"{row['revenue_change_pct']:+.2f}% "
+                      f"({row['increase_count']:.0f} up / {row['decrease_count']:.0f} down)")
+            print(f"\nScenario results saved to {SCENARIOS_PATH} in {time.perf_counter() - start_time:.2f}s")
+            return
+        
+        if mode == 'recommend-only':
+            # 加载已训练的模型
+            model = PricingModel.load(model_path)
+            print(f"Loaded model from {model_path}")
+        else:
+            # 创建并训练模型
+            model = PricingModel(backend)
+            importance = model.train(df)
+            model.save(model_path)
+        
+        if chunksize:
+            # 逐块生成价格建议并写出，同时累计统计信息
+            print(f"\n=== Streaming Price Recommendations (chunksize={chunksize}) ===")
+            summary = RecommendationSummary()
+            chunks = model.recommend_prices_stream(
+                iter_processed(columns=PRICING_COLUMNS, path=input_path, chunksize=chunksize), summary, strategy
+            )
+            rows = save_chunks(chunks, output_path)
+            summary.report()
+            print(f"\n{rows} recommendations saved to {output_path} in {time.perf_counter() - start_time:.2f}s")
+            return
+        
+        if incremental:
+            # 按指纹只重新计算变化的产品
+            print("\n=== Incremental Price Recommendations ===")
+            recommendations, summary, rescored = recommend_prices_incremental(
+                model, df, file_digest(model_path), output_path, strategy
+            )
+            revenue_change = ((summary['expected_revenue'] - summary['current_revenue'])
+                              / summary['current_revenue'] * 100)
+            print(f"Rescored {rescored} of {len(recommendations)} products")
+            print(f"Current total revenue: ₹{summary['current_revenue']:,.2f}")
+            print(f"Expected total revenue: ₹{summary['expected_revenue']:,.2f}")
+            print(f"Expected revenue change: {revenue_change:.1f}%")
+            print(f"\nRecommendations saved to {output_path} in {time.perf_counter() - start_time:.2f}s")
+            return
         
         # 生成价格建议
-        recommendations = model.recommend_prices(df)
+        recommendations = model.recommend_prices(df, strategy=strategy)
+        print(f"\nTime to first recommendation: {time.perf_counter() - start_time:.2f}s")
         
         # 显示部分结果
         print("\n=== Sample Recommendations ===")
@@ -230,11 +796,42 @@ def main():
             print(f"Recommendation: {row['recommendation']}")
         
         # 保存建议
-        recommendations.to_csv('data/price_recommendations.csv', index=False)
-        print("\nRecommendations saved to price_recommendations.csv")
+        save_chunks([recommendations], output_path)
+        print(f"\nRecommendations saved to {output_path}")
         
     except Exception as e:
         print(f"Error: {str(e)}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='定价模型')
+    parser.add_argument('mode', nargs='?', choices=['train', 'recommend-only', 'compare-backends', 'simulate'],
+                        default='train',
+                        help='train: 训练并保存模型; recommend-only: 加载已保存的模型直接生成建议; '
+                             'compare-backends: 比较各训练后端; simulate: 模拟不同调价参数的收入影响')
+    parser.add_argument('--model-path', default=MODEL_PATH, help='模型文件路径')
+    parser.add_argument('--input', default=PROCESSED_PATH, help='处理后的数据文件（Parquet，或同名的CSV）')
+    parser.add_argument('--backend', choices=BACKENDS, default='rf', help='训练后端')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='按块流式生成价格建议，每块的行数（默认一次性处理全部数据）')
+    parser.add_argument('--output', default=RECOMMENDATIONS_PATH,
+                        help='价格建议输出文件，.parquet 结尾时写Parquet，否则写CSV')
+    parser.add_argument('--strategy', choices=STRATEGIES, default='heuristic',
+                        help='调价策略: heuristic 为固定规则; elasticity 按类别价格弹性求收入最大的价格')
+    parser.add_argument('--incremental', action='store_true',
+                        help='只重新计算输入变化的产品，合并到上次的价格建议中')
+    # simulate 模式的参数网格
+    parser.add_argument('--clip', type=float, nargs='+', default=[3, 5, 7, 10],
+                        help='最大调价幅度（%%），上下限对称')
+    parser.add_argument('--base-weights', type=float, nargs='+', default=[2, 3, 4], help='综合得分权重')
+    parser.add_argument('--sentiment-weights', type=float, nargs='+', default=[0, 1, 2, 3], help='情感分数权重')
+    parser.add_argument('--multipliers', type=float, nargs='+', default=[0.5, 1, 1.5], help='调整幅度倍数')
+    args = parser.parse_args()
+    if args.incremental and args.chunksize:
+        parser.error('--incremental 不能与 --chunksize 同时使用')
+    if args.incremental and args.mode != 'recommend-only':
+        parser.error('--incremental 只能用于 recommend-only 模式（重新训练后所有产品都会重新计算）')
+    main(mode=args.mode, model_path=args.model_path, backend=args.backend,
+         chunksize=args.chunksize, output_path=args.output, incremental=args.incremental,
+         grid={'clip': args.clip, 'base_weight': args.base_weights, 'sentiment_weight': args.sentiment_weights,
+               'multiplier': args.multipliers},
+         strategy=args.strategy, input_path=args.input)
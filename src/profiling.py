@@ -0,0 +1,212 @@
+import argparse
+import atexit
+import json
+import os
+import resource
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# 设置该环境变量即开启性能记录：值为1时写入 TRACE_PATH，否则作为跟踪文件路径；未设置或为0时关闭
+PROFILE_ENV = 'PRICING_PROFILE'
+# 一次运行的编号，由最先开启记录的进程生成，子进程通过环境变量继承
+RUN_ENV = 'PRICING_PROFILE_RUN'
+# 跟踪文件：每个计时区段一行JSON，多次运行追加到同一文件，便于比较
+TRACE_PATH = 'data/profile_trace.jsonl'
+
+def _trace_path():
+    value = os.environ.get(PROFILE_ENV, '')
+    if value in ('', '0'):
+        return None
+    return os.path.abspath(TRACE_PATH if value == '1' else value)
+
+def peak_rss_mb():
+    """当前进程的内存峰值（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以KB为单位
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+class _Tracer:
+    """记录当前进程内的计时区段，最外层区段结束时追加写入跟踪文件"""
+
+    def __init__(self, path):
+        self.path = path
+        self.pid = os.getpid()
+        self.stack = []
+        self.records = []
+        # 子进程的环境变量在创建时复制，因此各进程共用同一个运行编号和跟踪文件路径
+        os.environ[PROFILE_ENV] = path
+        self.run_id = os.environ.get(RUN_ENV)
+        self.is_root = self.run_id is None
+        if self.is_root:
+            self.run_id = time.strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6]
+            os.environ[RUN_ENV] = self.run_id
+            self.started_at = time.time()
+            atexit.register(self._print_summary)
+
+    def flush(self):
+        if not self.records:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        lines = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in self.records)
+        self.records = []
+        # 单次追加写入，多个进程同时写也不会交错
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+    def _print_summary(self):
+        self.flush()
+        try:
+            print_summary(self.path, self.run_id)
+        except Exception as e:
+            print(f"性能汇总生成失败: {str(e)}")
+
+_tracer = None
+
+def _get_tracer():
+    """返回当前进程的记录器；以fork方式创建的子进程不沿用父进程的区段栈"""
+    global _tracer
+    if _tracer is not None and _tracer.pid != os.getpid():
+        _tracer.pid = os.getpid()
+        _tracer.stack = []
+        _tracer.records = []
+        _tracer.is_root = False
+    if _tracer is None:
+        path = _trace_path()
+        if path is None:
+            return None
+        _tracer = _Tracer(path)
+    return _tracer
+
+def enabled():
+    return _trace_path() is not None
+
+@contextmanager
+def span(name, rows=None):
+    """记录一个计时区段的墙钟时间、CPU时间、内存峰值和吞吐量
+
+    内存峰值是进程从启动到区段结束的最高值，包含同一进程中之前的工作；
+    rss_growth_mb 是区段内峰值的增长。流水线的每个阶段在新进程中运行，阶段的峰值即该阶段自身的峰值。
+
+    rows 为处理的行数；行数在区段内才能确定时，可写入返回字典的 'rows' 键：
+
+        with span('pricing.predict') as record:
+            ...
+            record['rows'] = len(df)
+
+    未开启记录时只返回一个空字典，开销可忽略。
+    """
+    record = {'rows': rows}
+    tracer = _get_tracer()
+    if tracer is None:
+        yield record
+        return
+
+    tracer.stack.append(name)
+    rss_before = peak_rss_mb()
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    started_at = time.time()
+    try:
+        yield record
+    finally:
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+        peak = peak_rss_mb()
+        tracer.stack.pop()
+        rows = record['rows']
+        tracer.records.append({
+            'run': tracer.run_id,
+            'pid': os.getpid(),
+            'name': name,
+            'parent': tracer.stack[-1] if tracer.stack else None,
+            'started_at': round(started_at, 6),
+            'wall_s': round(wall, 6),
+            'cpu_s': round(cpu, 6),
+            'peak_rss_mb': round(peak, 1),
+            'rss_growth_mb': round(peak - rss_before, 1),
+            'rows': rows,
+            'rows_per_sec': round(rows / wall, 1) if rows is not None and wall > 0 else None
+        })
+        if not tracer.stack:
+            tracer.flush()
+
+def load_trace(path=TRACE_PATH):
+    """读取跟踪文件，返回 {运行编号: [区段记录]}，按运行先后排列"""
+    runs = OrderedDict()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                runs.setdefault(record['run'], []).append(record)
+    return runs
+
+def summarize(records):
+    """按区段名称汇总：调用次数、总耗时、内存峰值、行数和吞吐量，按首次开始时间排列
+
+    多个进程并行执行的同名区段耗时相加，因此子步骤的合计可能超过所在阶段的墙钟时间。
+    """
+    summary = OrderedDict()
+    for record in sorted(records, key=lambda r: r['started_at']):
+        item = summary.setdefault(record['name'], {
+            'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'peak_rss_mb': 0.0, 'rows': None
+        })
+        item['calls'] += 1
+        item['wall_s'] += record['wall_s']
+        item['cpu_s'] += record['cpu_s']
+        item['peak_rss_mb'] = max(item['peak_rss_mb'], record['peak_rss_mb'])
+        if record['rows'] is not None:
+            item['rows'] = (item['rows'] or 0) + record['rows']
+    for item in summary.values():
+        item['rows_per_sec'] = item['rows'] / item['wall_s'] if item['rows'] and item['wall_s'] > 0 else None
+    return summary
+
+def print_summary(path=TRACE_PATH, run_id=None, baseline_id=None):
+    """打印一次运行的汇总表；与基准运行（默认为上一次运行）比较耗时变化"""
+    runs = load_trace(path)
+    if not runs:
+        print(f"跟踪文件中没有记录: {path}")
+        return
+    run_ids = list(runs)
+    if run_id is None:
+        run_id = run_ids[-1]
+    if run_id not in runs:
+        raise ValueError(f"跟踪文件中没有运行 {run_id}")
+    if baseline_id is None:
+        position = run_ids.index(run_id)
+        baseline_id = run_ids[position - 1] if position > 0 else None
+    summary = summarize(runs[run_id])
+    baseline = summarize(runs[baseline_id]) if baseline_id is not None else {}
+
+    print(f"\n=== Profile {run_id} ({path}) ===")
+    if baseline_id is not None:
+        print(f"Compared with run {baseline_id}")
+    print("peak MB is the process high-water mark when the span ended: for sub-steps it includes "
+          "earlier work in the same process; each pipeline stage runs in its own process")
+    print(f"{'span':<28} {'calls':>5} {'wall s':>9} {'cpu s':>9} {'peak MB':>9} "
+          f"{'rows':>10} {'rows/s':>11} {'vs base':>8}")
+    for name, item in summary.items():
+        rows = '-' if item['rows'] is None else f"{item['rows']:,}"
+        rate = '-' if item['rows_per_sec'] is None else f"{item['rows_per_sec']:,.0f}"
+        change = '-'
+        if name in baseline and baseline[name]['wall_s'] > 0:
+            change = f"{(item['wall_s'] / baseline[name]['wall_s'] - 1) * 100:+.0f}%"
+        print(f"{name:<28} {item['calls']:>5} {item['wall_s']:>9.3f} {item['cpu_s']:>9.3f} "
+              f"{item['peak_rss_mb']:>9.1f} {rows:>10} {rate:>11} {change:>8}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='查看性能跟踪汇总')
+    parser.add_argument('--trace', default=TRACE_PATH, help='跟踪文件路径')
+    parser.add_argument('--run', default=None, help='要查看的运行编号（默认最近一次）')
+    parser.add_argument('--baseline', default=None, help='用于比较的运行编号（默认上一次）')
+    parser.add_argument('--list', action='store_true', help='列出跟踪文件中的全部运行')
+    args = parser.parse_args()
+    if args.list:
+        for run_id, records in load_trace(args.trace).items():
+            names = sorted({record['name'] for record in records})
+            print(f"{run_id}: {len(records)} spans ({', '.join(names[:5])}{', ...' if len(names) > 5 else ''})")
+    else:
+        print_summary(args.trace, args.run, args.baseline)
@@ -1,58 +1,588 @@
+import argparse
+import csv
+import hashlib
+import multiprocessing
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
-from transformers import pipeline
-import torch
 
-def analyze_reviews():
-    """分析评论情感"""
-    try:
-        # 加载数据
-        print("=== Loading Data ===")
-        df = pd.read_csv('data/processed_amazon.csv')
-        
-        # 初始化BERT模型
-        print("Initializing BERT model...")
-        classifier = pipeline(
+from data_preprocessing import clean_text
+from profiling import span
+from storage import PROCESSED_PATH, load_processed, save_processed
+
+MODEL_NAME = 'distilbert-base-uncased-finetuned-sst-2-english'
+MAX_CHARS = 512  # 与逐行模式一致的字符截断长度
+NEUTRAL_RESULT = {'label': 'NEUTRAL', 'score': 0.5}
+CACHE_PATH = 'data/sentiment_cache.sqlite'
+CHECKPOINT_PATH = 'data/processed_amazon.sentiment.ckpt'
+MODEL_DIR = 'models/distilbert-sst2'  # 本地模型目录，ONNX 模型也导出到这里
+BACKENDS = ['pytorch', 'int8', 'onnx']
+GRANULARITIES = ['review', 'subreview', 'sentence']
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+class SentimentCache:
+    """基于SQLite的情感结果缓存，键为 模型名 + 评论文本 的哈希"""
+
+    def __init__(self, path=CACHE_PATH, model_name=MODEL_NAME):
+        self.path = path
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS sentiment '
+            '(key BLOB PRIMARY KEY, label TEXT NOT NULL, score REAL NOT NULL)'
+        )
+
+    def key(self, text):
+        """计算缓存键"""
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode('utf-8')).digest()
+
+    def get_many(self, keys, chunk_size=500):
+        """批量查询缓存，返回 {key: result}"""
+        found = {}
+        unique_keys = list(set(keys))
+        for start in range(0, len(unique_keys), chunk_size):
+            chunk = unique_keys[start:start + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f'SELECT key, label, score FROM sentiment WHERE key IN ({placeholders})', chunk
+            )
+            for key, label, score in rows:
+                found[key] = {'label': label, 'score': score}
+        return found
+
+    def put_many(self, items):
+        """批量写入 (key, result) 列表"""
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO sentiment (key, label, score) VALUES (?, ?, ?)',
+            [(key, r['label'], float(r['score'])) for key, r in items]
+        )
+        self.conn.commit()
+
+    def stats(self):
+        """缓存统计信息"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        }
+
+    def close(self):
+        self.conn.close()
+
+class SentimentCheckpoint:
+    """推理检查点：每完成一块就追加到侧文件，重启后从已完成的块继续"""
+
+    def __init__(self, path=CHECKPOINT_PATH, model_name=MODEL_NAME):
+        self.path = path
+        self.model_name = model_name
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def load(self):
+        """读取已完成的结果，返回 {key: result}"""
+        done = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, newline='', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                # 崩溃时最后一行可能不完整，直接跳过
+                if len(row) != 3:
+                    continue
+                try:
+                    done[row[0]] = {'label': row[1], 'score': float(row[2])}
+                except ValueError:
+                    continue
+        return done
+
+    def append(self, items):
+        """追加一块 (key, result) 结果并落盘"""
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerows((key, r['label'], repr(float(r['score']))) for key, r in items)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def ensure_local_model(model_dir=MODEL_DIR):
+    """确保本地模型目录存在，不存在时从Hugging Face下载并保存"""
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    if not os.path.exists(os.path.join(model_dir, 'config.json')):
+        print(f"Saving {MODEL_NAME} to {model_dir}...")
+        AutoTokenizer.from_pretrained(MODEL_NAME).save_pretrained(model_dir)
+        AutoModelForSequenceClassification.from_pretrained(MODEL_NAME).save_pretrained(model_dir)
+    return model_dir
+
+def export_onnx(model_dir=MODEL_DIR, onnx_path=None):
+    """从本地模型目录导出ONNX模型（只需导出一次）"""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    ensure_local_model(model_dir)
+    onnx_path = onnx_path or os.path.join(model_dir, 'model.onnx')
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    model.eval()
+
+    sample = tokenizer(['export sample'], return_tensors='pt')
+    print(f"Exporting ONNX model to {onnx_path}...")
+    torch.onnx.export(
+        model,
+        (sample['input_ids'], sample['attention_mask']),
+        onnx_path,
+        input_names=['input_ids', 'attention_mask'],
+        output_names=['logits'],
+        dynamic_axes={
+            'input_ids': {0: 'batch', 1: 'sequence'},
+            'attention_mask': {0: 'batch', 1: 'sequence'},
+            'logits': {0: 'batch'}
+        },
+        opset_version=14
+    )
+    return onnx_path
+
+class OnnxSentimentClassifier:
+    """onnxruntime 推理封装，调用方式与 transformers pipeline 相同"""
+
+    def __init__(self, model_dir=MODEL_DIR, num_threads=None):
+        import onnxruntime as ort
+        from transformers import AutoConfig, AutoTokenizer
+
+        onnx_path = os.path.join(model_dir, 'model.onnx')
+        if not os.path.exists(onnx_path):
+            export_onnx(model_dir, onnx_path)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.id2label = AutoConfig.from_pretrained(model_dir).id2label
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+
+    def __call__(self, texts, batch_size=32, truncation=True, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+
+        results = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(
+                texts[start:start + batch_size], padding=True, truncation=truncation, return_tensors='np'
+            )
+            logits = self.session.run(['logits'], {
+                'input_ids': encoded['input_ids'].astype(np.int64),
+                'attention_mask': encoded['attention_mask'].astype(np.int64)
+            })[0]
+            # softmax 得到各类别概率
+            probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probs /= probs.sum(axis=1, keepdims=True)
+            for row in probs:
+                best = int(row.argmax())
+                results.append({'label': self.id2label[best], 'score': float(row[best])})
+
+        return results
+
+def load_classifier(backend='pytorch', model_dir=MODEL_DIR, num_threads=None):
+    """初始化BERT模型
+
+    backend:
+        pytorch: 原始fp32模型
+        int8:    动态int8量化的PyTorch模型（仅CPU）
+        onnx:    导出的ONNX模型，由onnxruntime推理（仅CPU）
+
+    transformers 和 torch 在这里才导入：只使用 prepare_text、score_texts、score_reviews
+    并自行传入分类器时（如 benchmark 的桩分类器）不需要安装它们。
+    """
+    if backend == 'onnx':
+        return OnnxSentimentClassifier(model_dir, num_threads=num_threads)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}, expected one of {BACKENDS}")
+
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+
+    if backend == 'pytorch':
+        source = model_dir if os.path.exists(os.path.join(model_dir, 'config.json')) else MODEL_NAME
+        return pipeline(
             'sentiment-analysis',
-            model='distilbert-base-uncased-finetuned-sst-2-english',
+            model=source,
             device=0 if torch.cuda.is_available() else -1
         )
-        
-        # 分析评论
-        print("\nAnalyzing reviews...")
-        results = []
-        for idx, row in df.iterrows():
-            if idx % 100 == 0:
-                print(f"Processed {idx}/{len(df)} reviews...")
-                
-            if pd.isna(row['cleaned_review']) or len(str(row['cleaned_review']).strip()) == 0:
-                result = {'label': 'NEUTRAL', 'score': 0.5}
+
+    if backend == 'int8':
+        ensure_local_model(model_dir)
+        model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return pipeline(
+            'sentiment-analysis',
+            model=model,
+            tokenizer=AutoTokenizer.from_pretrained(model_dir),
+            device=-1
+        )
+
+def cache_model_name(backend):
+    """缓存键使用的模型名；量化/ONNX的得分有细微差异，单独缓存"""
+    return MODEL_NAME if backend == 'pytorch' else f"{MODEL_NAME}:{backend}"
+
+def prepare_text(text):
+    """预处理单条评论：空评论返回None，否则按字符截断"""
+    if pd.isna(text) or len(str(text).strip()) == 0:
+        return None
+    return str(text)[:MAX_CHARS]
+
+def score_texts(classifier, texts, batch_size=32, progress=True):
+    """按token长度分桶后批量推理，结果按输入顺序返回"""
+    if len(texts) == 0:
+        return []
+
+    # 按token长度排序，使同一批次内的长度接近，减少padding
+    encoded = classifier.tokenizer(list(texts), truncation=True)
+    lengths = [len(ids) for ids in encoded['input_ids']]
+    order = np.argsort(lengths, kind='stable')
+
+    results = [None] * len(texts)
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        outputs = classifier([texts[i] for i in batch], batch_size=len(batch), truncation=True)
+        # 将结果写回原始位置
+        for i, output in zip(batch, outputs):
+            results[i] = output
+
+        if progress and (start // batch_size) % 20 == 0:
+            print(f"Processed {min(start + batch_size, len(order))}/{len(order)} reviews...")
+
+    return results
+
+# 子进程中的模型实例，每个进程只加载一次
+_worker_classifier = None
+
+def _init_worker(num_threads, backend, model_dir):
+    """子进程初始化：固定torch线程数并加载模型"""
+    global _worker_classifier
+    import torch
+
+    torch.set_num_threads(num_threads)
+    _worker_classifier = load_classifier(backend, model_dir, num_threads=num_threads)
+
+def _score_shard(texts, batch_size):
+    """子进程中对一个分片打分"""
+    return score_texts(_worker_classifier, texts, batch_size=batch_size, progress=False)
+
+def _make_pool(workers, num_threads=None, backend='pytorch', model_dir=MODEL_DIR):
+    """创建推理进程池，每个进程加载一份模型"""
+    if num_threads is None:
+        num_threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"Starting {workers} workers x {num_threads} threads...")
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(num_threads, backend, model_dir)
+    )
+
+def _score_with_pool(executor, texts, workers, batch_size=32):
+    """按分片分配给各进程，结果按输入顺序合并"""
+    # 分片数多于进程数，便于负载均衡
+    n_shards = min(len(texts), workers * 4)
+    bounds = np.linspace(0, len(texts), n_shards + 1).astype(int)
+    shards = [texts[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+    results = []
+    # map按提交顺序返回结果
+    for shard_results in executor.map(_score_shard, shards, [batch_size] * len(shards)):
+        results.extend(shard_results)
+        print(f"Processed {len(results)}/{len(texts)} reviews...")
+    return results
+
+def score_texts_parallel(texts, workers, batch_size=32, num_threads=None, backend='pytorch', model_dir=MODEL_DIR):
+    """多进程打分，结果按输入顺序返回"""
+    with _make_pool(workers, num_threads, backend, model_dir) as executor:
+        return _score_with_pool(executor, texts, workers, batch_size=batch_size)
+
+def score_reviews(reviews, classifier=None, batch_size=32, cache=None, workers=1,
+                  backend='pytorch', model_dir=MODEL_DIR, checkpoint=None, checkpoint_every=5000):
+    """对评论列表打分，空评论记为NEUTRAL
+
+    相同文本只打分一次，再广播回所有行；只有缓存未命中的文本才送入模型。
+    给定checkpoint时按checkpoint_every条分块推理，每块完成后写入检查点。
+    """
+    prepared = [prepare_text(review) for review in reviews]
+
+    # 去重：变体商品共享同一段评论文本
+    texts = list(dict.fromkeys(text for text in prepared if text is not None))
+    n_nonempty = sum(text is not None for text in prepared)
+    if n_nonempty:
+        print(f"Deduplicated {n_nonempty} reviews to {len(texts)} unique texts "
+              f"(dedup ratio {n_nonempty / len(texts):.2f}x, {(1 - len(texts) / n_nonempty) * 100:.1f}% fewer to score)")
+
+    results = [None] * len(texts)
+    todo = list(range(len(texts)))
+    if cache is not None:
+        with span('sentiment.cache_lookup', rows=len(todo)):
+            keys = {i: cache.key(texts[i]) for i in todo}
+            cached = cache.get_many(list(keys.values()))
+            for i in todo:
+                if keys[i] in cached:
+                    results[i] = cached[keys[i]]
+            todo = [i for i in todo if keys[i] not in cached]
+        cache.misses += len(todo)
+        cache.hits += len(keys) - len(todo)
+
+    if checkpoint is not None:
+        # 从上次中断处继续
+        ckpt_keys = {i: checkpoint.key(texts[i]) for i in todo}
+        done = checkpoint.load()
+        resumed = [i for i in todo if ckpt_keys[i] in done]
+        for i in resumed:
+            results[i] = done[ckpt_keys[i]]
+        if resumed:
+            print(f"Resumed {len(resumed)} results from checkpoint {checkpoint.path}")
+            if cache is not None:
+                cache.put_many([(keys[i], results[i]) for i in resumed])
+        todo = [i for i in todo if ckpt_keys[i] not in done]
+
+    if todo:
+        chunk_size = checkpoint_every if checkpoint is not None else len(todo)
+        executor = None
+        if workers > 1:
+            executor = _make_pool(workers, backend=backend, model_dir=model_dir)
+        elif classifier is None:
+            # 仅在有需要推理的评论时加载模型
+            print("Initializing BERT model...")
+            with span('sentiment.load_model'):
+                classifier = load_classifier(backend, model_dir)
+
+        try:
+            for start in range(0, len(todo), chunk_size):
+                chunk = todo[start:start + chunk_size]
+                chunk_texts = [texts[i] for i in chunk]
+                with span('sentiment.inference', rows=len(chunk_texts)):
+                    if executor is not None:
+                        scored = _score_with_pool(executor, chunk_texts, workers, batch_size=batch_size)
+                    else:
+                        scored = score_texts(classifier, chunk_texts, batch_size=batch_size)
+
+                for i, result in zip(chunk, scored):
+                    results[i] = result
+                if cache is not None:
+                    cache.put_many([(keys[i], results[i]) for i in chunk])
+                if checkpoint is not None:
+                    checkpoint.append([(ckpt_keys[i], results[i]) for i in chunk])
+                    print(f"Checkpointed {start + len(chunk)}/{len(todo)} reviews")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    # 广播回原始行
+    unique_results = dict(zip(texts, results))
+    return [dict(NEUTRAL_RESULT) if text is None else unique_results[text] for text in prepared]
+
+def split_review(title, content, granularity='sentence'):
+    """拆分评论：subreview按原始逗号分隔的子评论拆分，sentence再按句子拆分"""
+    pieces = []
+    for text in (title, content):
+        if not isinstance(text, str):
+            continue
+        for sub_review in text.split(','):
+            if granularity == 'sentence':
+                pieces.extend(SENTENCE_SPLIT.split(sub_review))
             else:
-                result = classifier(str(row['cleaned_review'])[:512])[0]
-            
-            results.append(result)
-        
-        # 添加结果到数据框
-        df['sentiment'] = [r['label'] for r in results]
-        df['sentiment_score'] = [r['score'] for r in results]
-        
+                pieces.append(sub_review)
+
+    # 与整条评论相同的清洗方式，丢弃清洗后为空的片段
+    cleaned = (prepare_text(clean_text(piece)) for piece in pieces)
+    return [piece for piece in cleaned if piece is not None]
+
+def score_pieces(df, granularity='sentence', **score_kwargs):
+    """对拆分后的所有片段一次性批量打分，并按行聚合
+
+    返回的数据框与df同索引，包含:
+        sentiment_mean:  各片段正面概率的均值
+        sentiment_min:   各片段正面概率的最小值
+        negative_share:  负面片段占比
+        sentiment / sentiment_score: 由均值得到的整体标签及其概率
+    """
+    pieces = []
+    owners = []
+    for pos, (title, content) in enumerate(zip(df['review_title'], df['review_content'])):
+        row_pieces = split_review(title, content, granularity)
+        pieces.extend(row_pieces)
+        owners.extend([pos] * len(row_pieces))
+    print(f"Split {len(df)} reviews into {len(pieces)} {granularity} pieces")
+
+    results = score_reviews(pieces, **score_kwargs)
+    owners = np.asarray(owners, dtype=np.int64)
+    positive_prob = np.array([
+        r['score'] if r['label'] == 'POSITIVE' else 1 - r['score'] for r in results
+    ], dtype=np.float64)
+    is_negative = np.array([r['label'] == 'NEGATIVE' for r in results], dtype=np.float64)
+
+    # 按行向量化聚合
+    n_rows = len(df)
+    counts = np.bincount(owners, minlength=n_rows)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(owners, weights=positive_prob, minlength=n_rows) / counts
+        negative_share = np.bincount(owners, weights=is_negative, minlength=n_rows) / counts
+    minimum = np.full(n_rows, np.inf)
+    np.minimum.at(minimum, owners, positive_prob)
+    minimum[counts == 0] = np.nan
+
+    aggregated = pd.DataFrame({
+        'sentiment_mean': mean,
+        'sentiment_min': minimum,
+        'negative_share': negative_share
+    }, index=df.index)
+
+    # 整体标签：没有有效片段的行记为NEUTRAL
+    aggregated['sentiment'] = np.where(
+        counts == 0, NEUTRAL_RESULT['label'], np.where(mean >= 0.5, 'POSITIVE', 'NEGATIVE')
+    )
+    aggregated['sentiment_score'] = np.where(
+        counts == 0, NEUTRAL_RESULT['score'], np.where(mean >= 0.5, mean, 1 - mean)
+    )
+    return aggregated
+
+def compare_backends(texts, backends=BACKENDS, model_dir=MODEL_DIR, batch_size=32):
+    """在固定样本上比较各后端的吞吐量和相对PyTorch的得分偏差"""
+    rows = []
+    baseline = None
+    for backend in backends:
+        classifier = load_classifier(backend, model_dir)
+        start_time = time.perf_counter()
+        results = score_texts(classifier, texts, batch_size=batch_size, progress=False)
+        elapsed = time.perf_counter() - start_time
+
+        # 统一换算为正面概率后比较
+        labels = np.array([r['label'] for r in results])
+        positive_prob = np.array([
+            r['score'] if r['label'] == 'POSITIVE' else 1 - r['score'] for r in results
+        ])
+        if baseline is None:
+            baseline = (labels, positive_prob)
+        drift = np.abs(positive_prob - baseline[1])
+
+        rows.append({
+            'backend': backend,
+            'reviews_per_sec': len(texts) / max(elapsed, 1e-9),
+            'label_agreement': (labels == baseline[0]).mean(),
+            'mean_drift': drift.mean(),
+            'max_drift': drift.max()
+        })
+
+    comparison = pd.DataFrame(rows)
+    comparison['speedup'] = comparison['reviews_per_sec'] / comparison['reviews_per_sec'].iloc[0]
+
+    print(f"\n=== Backend Comparison ({len(texts)} reviews, baseline {backends[0]}) ===")
+    for _, row in comparison.iterrows():
+        print(f"{row['backend']:>8}: {row['reviews_per_sec']:8.1f} reviews/sec ({row['speedup']:.2f}x), "
+              f"label agreement {row['label_agreement']*100:.2f}%, "
+              f"score drift mean {row['mean_drift']:.5f} / max {row['max_drift']:.5f}")
+
+    return comparison
+
+def analyze_reviews(batch_size=32, use_cache=True, cache_path=CACHE_PATH, workers=1,
+                    backend='pytorch', model_dir=MODEL_DIR, checkpoint_path=CHECKPOINT_PATH,
+                    checkpoint_every=5000, granularity='review',
+                    input_path=PROCESSED_PATH, output_path=PROCESSED_PATH):
+    """分析评论情感
+
+    granularity为review时对整条评论（截断到512字符）打分；
+    为subreview/sentence时拆分后逐片段打分，并额外输出片段级聚合列。
+    默认读取并原地更新处理后的数据，也可以写到另一个文件。
+    """
+    cache = SentimentCache(cache_path, model_name=cache_model_name(backend)) if use_cache else None
+    checkpoint = SentimentCheckpoint(checkpoint_path, model_name=cache_model_name(backend))
+    try:
+        # 加载数据
+        print("=== Loading Data ===")
+        df = load_processed(path=input_path)
+
+        # 批量分析评论
+        print(f"\nAnalyzing reviews (backend {backend}, batch size {batch_size})...")
+        start_time = time.perf_counter()
+        score_kwargs = dict(
+            batch_size=batch_size, cache=cache, workers=workers,
+            backend=backend, model_dir=model_dir, checkpoint=checkpoint, checkpoint_every=checkpoint_every
+        )
+        if granularity == 'review':
+            results = score_reviews(df['cleaned_review'].tolist(), **score_kwargs)
+            # 添加结果到数据框
+            df['sentiment'] = [r['label'] for r in results]
+            df['sentiment_score'] = [r['score'] for r in results]
+        else:
+            aggregated = score_pieces(df, granularity, **score_kwargs)
+            for col in aggregated.columns:
+                df[col] = aggregated[col]
+        elapsed = time.perf_counter() - start_time
+        print(f"Scored {len(df)} reviews in {elapsed:.1f}s ({len(df) / max(elapsed, 1e-9):.1f} reviews/sec)")
+
         # 计算情感分布
         total = len(df)
         positive = sum(df['sentiment'] == 'POSITIVE')
         negative = sum(df['sentiment'] == 'NEGATIVE')
-        
+
         print("\n=== Sentiment Analysis Results ===")
         print(f"Total reviews: {total}")
         print(f"Positive: {positive} ({positive/total*100:.1f}%)")
         print(f"Negative: {negative} ({negative/total*100:.1f}%)")
         print(f"Ratio (Positive:Negative) = {positive}:{negative} ({positive/negative:.2f}:1)")
         print(f"Average sentiment score: {df['sentiment_score'].mean():.2f}")
-        
-        # 保存结果
-        df.to_csv('data/processed_amazon.csv', index=False)
-        print("\nResults saved to processed_amazon.csv")
-        
+
+        # 保存结果（原子替换，崩溃不会损坏输入文件）
+        save_processed(df, output_path)
+        checkpoint.remove()
+        print(f"\nResults saved to {output_path}")
+
+        if cache is not None:
+            stats = cache.stats()
+            print("\n=== Sentiment Cache ===")
+            print(f"Hits: {stats['hits']}, Misses: {stats['misses']}, Size: {stats['bytes'] / 1024 / 1024:.1f} MB")
+
     except Exception as e:
         print(f"Error: {str(e)}")
+    finally:
+        if cache is not None:
+            cache.close()
 
 if __name__ == "__main__":
-    analyze_reviews()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='评论情感分析')
+    parser.add_argument('--batch-size', type=int, default=32, help='每批推理的评论数（1 即逐条推理）')
+    parser.add_argument('--no-cache', action='store_true', help='不使用情感缓存，全部重新推理')
+    parser.add_argument('--cache-path', default=CACHE_PATH, help='情感缓存文件路径')
+    parser.add_argument('--granularity', choices=GRANULARITIES, default='review',
+                        help='打分粒度：整条评论 / 逗号分隔的子评论 / 句子')
+    parser.add_argument('--checkpoint-every', type=int, default=5000, help='每推理多少条评论写一次检查点')
+    parser.add_argument('--workers', type=int, default=1, help='推理进程数（每个进程加载一份模型）')
+    parser.add_argument('--backend', choices=BACKENDS, default='pytorch', help='推理后端')
+    parser.add_argument('--model-dir', default=MODEL_DIR, help='本地模型目录（int8/onnx后端从这里加载和导出）')
+    parser.add_argument('--compare-backends', type=int, metavar='N',
+                        help='在N条固定样本评论上比较各后端的吞吐量和得分偏差，不写回数据')
+    args = parser.parse_args()
+
+    if args.compare_backends:
+        reviews = load_processed(columns=['cleaned_review'])['cleaned_review']
+        texts = [prepare_text(r) for r in reviews]
+        sample = pd.Series([t for t in texts if t is not None])
+        sample = sample.sample(min(args.compare_backends, len(sample)), random_state=42).tolist()
+        compare_backends(sample, model_dir=args.model_dir, batch_size=args.batch_size)
+    else:
+        analyze_reviews(
+            batch_size=args.batch_size,
+            use_cache=not args.no_cache,
+            cache_path=args.cache_path,
+            workers=args.workers,
+            backend=args.backend,
+            model_dir=args.model_dir,
+            checkpoint_every=args.checkpoint_every,
+            granularity=args.granularity
+        )
@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# 原始数据
+RAW_PATH = 'data/amazon.csv'
+# 各阶段共享的中间数据（列式存储）
+PROCESSED_PATH = 'data/processed_amazon.parquet'
+# 以分类类型存储的列
+CATEGORICAL_COLUMNS = ['category', 'main_category']
+
+def atomic_write(path, write):
+    """先写入临时文件再重命名，避免中途崩溃损坏目标文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    try:
+        write(tmp_path)
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def atomic_write_csv(df, path, **kwargs):
+    """原子写入CSV文件"""
+    atomic_write(path, lambda tmp_path: df.to_csv(tmp_path, index=False, **kwargs))
+
+def to_columnar_types(df):
+    """转换为紧凑的列类型：类别列用category，浮点列用float32"""
+    df = df.copy()
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    float_cols = df.select_dtypes(include=[np.float64]).columns
+    df[float_cols] = df[float_cols].astype(np.float32)
+    return df
+
+def save_processed(df, path=PROCESSED_PATH):
+    """以Parquet格式原子写入处理后的数据"""
+    table = to_columnar_types(df)
+    atomic_write(path, lambda tmp_path: table.to_parquet(tmp_path, index=False))
+
+def load_processed(columns=None, path=PROCESSED_PATH):
+    """读取处理后的数据，只加载需要的列
+
+    Parquet文件不存在时回退到同名的旧版CSV文件。
+    """
+    if os.path.exists(path):
+        return pd.read_parquet(path, columns=columns, memory_map=True)
+
+    csv_path = os.path.splitext(path)[0] + '.csv'
+    if os.path.exists(csv_path):
+        return pd.read_csv(csv_path, usecols=columns)
+
+    raise FileNotFoundError(f"找不到处理后的数据: {path}")
+
+def count_rows(path):
+    """Parquet文件的行数，只读取文件元数据；文件不存在时为None"""
+    if not os.path.exists(path):
+        return None
+    return pq.ParquetFile(path).metadata.num_rows
+
+def iter_processed(columns=None, path=PROCESSED_PATH, chunksize=100_000):
+    """按块读取处理后的数据，内存占用只与块大小有关"""
+    if os.path.exists(path):
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    csv_path = os.path.splitext(path)[0] + '.csv'
+    if os.path.exists(csv_path):
+        yield from pd.read_csv(csv_path, usecols=columns, chunksize=chunksize)
+        return
+
+    raise FileNotFoundError(f"找不到处理后的数据: {path}")
+
+def save_chunks(chunks, path):
+    """将数据块流式原子写入CSV或Parquet文件（按扩展名），返回写入的行数"""
+    rows = 0
+
+    def write_parquet(tmp_path):
+        nonlocal rows
+        writer = None
+        try:
+            for chunk in chunks:
+                if writer is None:
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    writer = pq.ParquetWriter(tmp_path, table.schema)
+                else:
+                    table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+                writer.write_table(table)
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def write_csv(tmp_path):
+        nonlocal rows
+        with open(tmp_path, 'w', newline='') as f:
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(f, header=i == 0, index=False)
+                rows += len(chunk)
+
+    atomic_write(path, write_parquet if path.endswith('.parquet') else write_csv)
+    return rows